@@ -0,0 +1,522 @@
+"""
+Benchmark Pipeline Deteksi + OCR (CPU, offline)
+===============================================
+Memutar ulang satu set input yang tetap (folder gambar, klip video, atau
+adegan sintetis dengan seed tetap) melalui setiap tahap pipeline:
+
+  yolo         YOLO per frame
+  association  pemisahan kelas + associate_violations
+  preprocess   plate_ocr.preprocess_plate_image per crop plat
+  ocr          plate_ocr.perform_ocr per crop plat
+  save_logs    LogStore: append + commit satu record
+  end_to_end   Detector.detect per frame, termasuk tracking, antrean OCR,
+               voting dan penulisan log (ditunggu sampai selesai)
+
+Untuk setiap tahap dilaporkan throughput, latensi p50/p95/p99, serta RSS
+sebelum/sesudah tahap (selisihnya) dan puncak RSS selama tahap itu. Hasil
+disimpan sebagai JSON; --compare membandingkan dengan hasil sebelumnya.
+Hanya CPU. Tanpa weights (--weights tidak ada) dipakai model pengganti
+kecil yang mendeteksi blob warna pada adegan sintetis, dan OCR pengganti
+dipakai kecuali --ocr paddle.
+
+Contoh:
+    python benchmark.py --output bench/sebelum.json
+    python benchmark.py --output bench/sesudah.json --compare bench/sebelum.json
+    python benchmark.py --weights trained-nano-120epoch-dataset-II.pt --video rekaman.mp4 --frames 300 --ocr paddle
+"""
+
+import os
+
+# Hanya CPU: sembunyikan GPU sebelum torch / paddle di-import
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import argparse
+import contextlib
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'helmet-detection-system', 'backend'))
+from association import associate_violations
+from detections import Detections, CLASS_NAMES
+from log_store import LogStore
+import plate_ocr
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# ---------------------------------------------------------------------------
+# Model pengganti (tanpa weights / tanpa unduhan)
+# ---------------------------------------------------------------------------
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(data)
+
+    def __len__(self):
+        return len(self.data.array)
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+class StandInYOLO:
+    """
+    Pengganti YOLO: blob warna murni -> box, dengan antarmuka hasil yang sama
+    seperti ultralytics (boxes.data = x1, y1, x2, y2, conf, cls). Cocok untuk
+    adegan sintetis; biayanya jauh lebih kecil dari YOLO asli.
+    """
+    names = dict(enumerate(CLASS_NAMES))
+    # class id -> (BGR bawah, BGR atas)
+    COLORS = {
+        0: ((0, 200, 0), (60, 255, 60)),        # with helmet: hijau
+        1: ((0, 0, 200), (60, 60, 255)),        # without helmet: merah
+        2: ((200, 0, 0), (255, 60, 60)),        # rider: biru
+        3: ((200, 200, 200), (255, 255, 255)),  # number plate: putih
+    }
+
+    def __call__(self, frames, imgsz=None, verbose=False, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        return [self._detect(frame) for frame in frames]
+
+    def _detect(self, frame):
+        rows = []
+        for cls_id, (lower, upper) in self.COLORS.items():
+            mask = cv2.inRange(frame, np.array(lower), np.array(upper))
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            for contour in contours:
+                x, y, w, h = cv2.boundingRect(contour)
+                if w * h >= 100:
+                    rows.append([x, y, x + w, y + h, 0.9, cls_id])
+        return _Result(np.array(rows, dtype=np.float32).reshape(-1, 6))
+
+
+class StandInOCR:
+    """
+    Pengganti PaddleOCR: biaya kecil yang deterministik (resize, threshold,
+    profil kolom seperti input CTC) dan hasil berformat plat Indonesia.
+    """
+
+    def predict(self, img):
+        imgs = img if isinstance(img, list) else [img]
+        return [self._read(i) for i in imgs]
+
+    def _read(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        strip = cv2.resize(gray, (320, 48), interpolation=cv2.INTER_LINEAR)
+        _, binary = cv2.threshold(strip, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        columns = (binary.mean(axis=0) > 127).astype(np.int8)
+        strokes = int(np.count_nonzero(np.diff(columns)))
+        return {'rec_texts': [f"B {1000 + strokes} XY"], 'rec_scores': [0.95]}
+
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+
+def synthetic_frames(count, width=1280, height=720, riders=3, seed=0):
+    """Adegan tetap (seed): pengendara bergerak, separuh tanpa helm, tiap pengendara dengan plat."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 140, (height, width, 3), dtype=np.uint8)
+    starts = rng.integers(0, width - 160, riders)
+    speeds = rng.integers(3, 10, riders)
+    lane = height // riders
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for r in range(riders):
+            x = int(starts[r] + speeds[r] * i) % (width - 160)
+            y = r * lane + 10
+            cv2.rectangle(frame, (x, y), (x + 120, y + lane - 20), (255, 0, 0), -1)
+            head = (0, 255, 0) if r % 2 else (0, 0, 255)
+            cv2.rectangle(frame, (x + 40, y + 8), (x + 80, y + 48), head, -1)
+            py = y + lane - 70
+            cv2.rectangle(frame, (x + 15, py), (x + 105, py + 32), (255, 255, 255), -1)
+            cv2.putText(frame, f"B {1234 + r * 1111} XY", (x + 18, py + 22),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(args):
+    """Returns (frames, deskripsi input)."""
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        return frames, f"video:{args.video}"
+    if args.images:
+        exts = {'.jpg', '.jpeg', '.png', '.bmp'}
+        paths = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in exts)[:args.frames]
+        frames = [img for img in (cv2.imread(str(p)) for p in paths) if img is not None]
+        return frames, f"images:{args.images}"
+    return synthetic_frames(args.frames, seed=args.seed), f"synthetic:{args.frames}@seed{args.seed}"
+
+
+# ---------------------------------------------------------------------------
+# Pengukuran
+# ---------------------------------------------------------------------------
+
+def current_rss_mb():
+    """Resident memory proses ini saat ini (MB), atau None bila tidak tersedia."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+class MemoryProbe:
+    """
+    RSS di sekitar satu tahap: sebelum, sesudah, dan puncak selama tahap,
+    diambil dengan thread sampler. ru_maxrss tidak dipakai karena itu puncak
+    sepanjang umur proses, sehingga tiap tahap hanya mewarisi puncak tahap
+    sebelumnya.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stop = threading.Event()
+        self.before = self.after = self.peak = None
+
+    def _sample(self):
+        while not self.stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self.before = self.peak = current_rss_mb()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.after = current_rss_mb()
+        if self.after is not None and (self.peak is None or self.after > self.peak):
+            self.peak = self.after
+        return False
+
+    def stats(self):
+        if self.before is None or self.after is None:
+            return {"rss_before_mb": None, "rss_delta_mb": None, "peak_rss_mb": None}
+        return {"rss_before_mb": self.before, "rss_delta_mb": round(self.after - self.before, 1),
+                "peak_rss_mb": self.peak}
+
+
+def summarize(times, wall=None, items=None):
+    """times: detik per panggilan; items: jumlah unit yang diproses (default: jumlah panggilan)."""
+    if not times:
+        return {"count": 0}
+    ms = np.array(times) * 1000
+    wall = wall if wall is not None else float(sum(times))
+    items = items if items is not None else len(times)
+    return {
+        "count": len(times),
+        "throughput_per_s": round(items / wall, 2) if wall else None,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+def time_each(fn, inputs, warmup=3, repeat=1):
+    for item in inputs[:warmup]:
+        fn(item)
+    times = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def extract_plate(image, bbox, pad=5):
+    """Sama seperti Detector.extract_license_plate."""
+    x1, y1, x2, y2 = map(int, bbox)
+    height, width = image.shape[:2]
+    return image[max(0, y1 - pad):min(height, y2 + pad), max(0, x1 - pad):min(width, x2 + pad)]
+
+
+def bench_yolo(model, frames, imgsz, warmup):
+    kwargs = {} if imgsz is None else {'imgsz': imgsz}
+    times = time_each(lambda frame: model([frame], verbose=False, **kwargs), frames, warmup)
+    detections = [Detections.from_yolo(model([frame], verbose=False, **kwargs), model.names) for frame in frames]
+    return summarize(times), detections
+
+
+def bench_association(detections, warmup, repeat):
+    def associate(dets):
+        by_class = dets.by_class()
+        associate_violations(by_class['without helmet'].xyxy, by_class['rider'].xyxy,
+                             by_class['number plate'].xyxy)
+    return summarize(time_each(associate, detections, warmup, repeat))
+
+
+def bench_save_logs(records, warmup, tmp):
+    store = LogStore(os.path.join(tmp, 'save_logs.db'), flush_interval=0.0)
+
+    def save(record):
+        store.append(record)
+        store.flush()
+    return summarize(time_each(save, records, warmup))
+
+
+def bench_end_to_end(frames, yolo_model, ocr_model, args, tmp):
+    # Import di sini: Detector butuh torch + paddleocr, tahap lain tidak
+    from detection import Detector
+    from metrics import REGISTRY
+
+    cwd = os.getcwd()
+    # Detector menulis crop dan log relatif terhadap cwd
+    with open(os.devnull, 'w') as devnull:
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                detector = Detector(yolo_model=yolo_model, ocr_model=ocr_model,
+                                    log_store=LogStore(os.path.join(tmp, 'end_to_end.db')),
+                                    latency_budget_ms=None, motion_gating=False)
+                for frame in frames[:args.warmup]:
+                    detector.detect(frame, 'warmup')
+                detector.flush()
+                detector.remove_stream('warmup')
+                # Crop warmup tidak boleh menjadi cache hit: OCR harus ikut terukur
+                if detector.ocr_cache is not None:
+                    detector.ocr_cache.clear()
+                detector.log_store.flush()
+                warmup_violations = detector.log_store.last_id()
+
+                before = REGISTRY.snapshot()["counters"]
+                times = []
+                start = time.perf_counter()
+                for frame in frames:
+                    t = time.perf_counter()
+                    detector.detect(frame, 'bench')
+                    times.append(time.perf_counter() - t)
+                # OCR dan log yang masih antre termasuk dalam waktu end-to-end
+                detector.flush()
+                wall = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    result = summarize(times, wall=wall)
+    result["violations"] = detector.log_store.last_id() - warmup_violations
+    snapshot = REGISTRY.snapshot()
+    result["detector_stages"] = snapshot["stages"]
+    # Counter hanya untuk frame yang diukur (tanpa warmup / tahap lain)
+    result["counters"] = {k: v - before.get(k, 0) for k, v in snapshot["counters"].items() if v - before.get(k, 0)}
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Laporan
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_table(stages):
+    print(f"\n{'Tahap':<14}{'n':>7}{'item/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δ RSS MB':>10}{'puncak MB':>11}")
+    for name, row in stages.items():
+        if "error" in row:
+            print(f"{name:<14}  gagal: {row['error']}")
+            continue
+        if not row.get("count"):
+            print(f"{name:<14}  (tidak ada data)")
+            continue
+        print(f"{name:<14}{row['count']:>7}{row['throughput_per_s']:>11}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{str(row.get('rss_delta_mb')):>10}"
+              f"{str(row.get('peak_rss_mb')):>11}")
+
+
+def print_comparison(previous, current):
+    print(f"\nPerbandingan dengan {previous.get('meta', {}).get('commit') or 'hasil sebelumnya'}:")
+    print(f"{'Tahap':<14}{'p50 lama':>10}{'p50 baru':>10}{'Δ p50':>9}{'Δ p95':>9}{'Δ item/s':>10}")
+
+    def change(old, new):
+        if not old or new is None:
+            return '-'
+        return f"{100.0 * (new - old) / old:+.1f}%"
+
+    for name, row in current["stages"].items():
+        old = previous.get("stages", {}).get(name)
+        if not old or not old.get("count") or not row.get("count"):
+            continue
+        print(f"{name:<14}{old['p50_ms']:>10}{row['p50_ms']:>10}{change(old['p50_ms'], row['p50_ms']):>9}"
+              f"{change(old['p95_ms'], row['p95_ms']):>9}"
+              f"{change(old['throughput_per_s'], row['throughput_per_s']):>10}")
+    if previous.get("meta", {}).get("input") != current["meta"]["input"]:
+        print("[WARNING] Input berbeda dengan hasil sebelumnya; angka tidak sebanding")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tahap-tahap pipeline deteksi + OCR (CPU, offline)")
+    parser.add_argument('--weights', help="Weights YOLO; bila tidak ada dipakai model pengganti")
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--ocr', default='standin', choices=['standin', 'paddle'],
+                        help="paddle memakai PaddleOCR asli (model harus sudah terunduh untuk offline)")
+    parser.add_argument('--images', help="Folder gambar sebagai input")
+    parser.add_argument('--video', help="Klip video sebagai input")
+    parser.add_argument('--frames', type=int, default=120, help="Jumlah frame/gambar maksimal")
+    parser.add_argument('--seed', type=int, default=0, help="Seed adegan sintetis")
+    parser.add_argument('--imgsz', type=int)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20, help="Pengulangan untuk tahap yang sangat cepat")
+    parser.add_argument('--threads', type=int, help="Batasi thread CPU (OpenCV/torch) agar hasil stabil")
+    parser.add_argument('--stages', nargs='+',
+                        default=['yolo', 'association', 'preprocess', 'ocr', 'save_logs', 'end_to_end'])
+    parser.add_argument('--output', help="Simpan hasil sebagai JSON")
+    parser.add_argument('--compare', help="JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+        try:
+            import torch
+            torch.set_num_threads(args.threads)
+        except ImportError:
+            pass
+
+    frames, source = load_frames(args)
+    if not frames:
+        print(f"[ERROR] Tidak ada input: {source}")
+        return
+    print(f"[INFO] Input: {source} ({len(frames)} frame)")
+
+    if args.weights and os.path.exists(args.weights):
+        from inference import load_yolo
+        yolo_model = load_yolo(args.weights, args.backend, device='cpu', imgsz=args.imgsz or 640)
+        yolo_name = f"{os.path.basename(args.weights)} ({args.backend})"
+    else:
+        if args.weights:
+            print(f"[WARNING] Weights tidak ditemukan: {args.weights}, memakai model pengganti")
+        yolo_model = StandInYOLO()
+        yolo_name = "standin"
+    if args.ocr == 'paddle':
+        from paddleocr import PaddleOCR
+        ocr_model = PaddleOCR(use_angle_cls=True, lang='en')
+    else:
+        ocr_model = StandInOCR()
+    print(f"[INFO] YOLO: {yolo_name}, OCR: {args.ocr}")
+
+    stages = {}
+    detections = None
+
+    def run(name, fn):
+        if name not in args.stages:
+            return
+        print(f"[INFO] Tahap: {name}")
+        try:
+            with MemoryProbe() as probe:
+                row = fn()
+            stages[name] = {**row, **probe.stats()}
+        except Exception as e:
+            print(f"[ERROR] {name}: {e}")
+            stages[name] = {"error": str(e)}
+
+    # YOLO dibutuhkan untuk input tahap lain, jadi selalu dijalankan
+    with MemoryProbe() as probe:
+        yolo_stats, detections = bench_yolo(yolo_model, frames, args.imgsz, args.warmup)
+    if 'yolo' in args.stages:
+        stages['yolo'] = {**yolo_stats, **probe.stats()}
+
+    crops = [extract_plate(frame, box) for frame, dets in zip(frames, detections)
+             for box in dets.by_class()['number plate'].xyxy]
+    crops = [c for c in crops if c.size > 0]
+    records = [{"timestamp": datetime.now().isoformat(), "plate_text": f"B {1000 + i} XY", "confidence": 0.9,
+                "image_path": f"/static/crops/bench_{i}.jpg", "type": "No Helmet", "camera_id": "bench"}
+               for i in range(max(50, len(crops)))]
+
+    run('association', lambda: bench_association(detections, args.warmup, args.repeat))
+    run('preprocess', lambda: summarize(time_each(plate_ocr.preprocess_plate_image, crops, args.warmup)))
+    run('ocr', lambda: summarize(time_each(lambda c: plate_ocr.perform_ocr(ocr_model, c), crops, args.warmup)))
+    # Semua file sementara (SQLite, crop) di satu folder yang dihapus di akhir
+    tmp = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        run('save_logs', lambda: bench_save_logs(records, args.warmup, tmp))
+        run('end_to_end', lambda: bench_end_to_end(frames, yolo_model, ocr_model, args, tmp))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec='seconds'),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "threads": args.threads,
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "yolo": yolo_name,
+            "ocr": args.ocr,
+            "input": source,
+            "frames": len(frames),
+            "plate_crops": len(crops),
+            "imgsz": args.imgsz
+        },
+        "stages": stages
+    }
+
+    print_table(stages)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Hasil disimpan ke: {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Perbandingan Backend Inferensi YOLO (CPU)
+=========================================
+Mengukur latensi CPU dan mAP untuk backend torch, onnx, dan openvino
+(opsional INT8) dari weights yang sama. Tidak ada angka bawaan: semua
+hasil diukur di mesin tempat skrip ini dijalankan.
+
+Contoh:
+    python compare_backends.py --weights trained-nano-120epoch-dataset-II.pt \\
+        --images tes-gambar --data rider.yaml --int8 --calib tes-gambar
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'helmet-detection-system', 'backend'))
+from inference import load_yolo
+
+
+def load_images(images_dir):
+    exts = {'.jpg', '.jpeg', '.png', '.bmp'}
+    paths = sorted(p for p in Path(images_dir).iterdir() if p.suffix.lower() in exts)
+    return [img for img in (cv2.imread(str(p)) for p in paths) if img is not None]
+
+
+def measure_latency(model, images, imgsz, runs, warmup=3):
+    """Latensi per gambar (ms) dengan batch=1 di CPU."""
+    for img in images[:warmup]:
+        model(img, imgsz=imgsz, device='cpu', verbose=False)
+
+    times = []
+    for _ in range(runs):
+        for img in images:
+            start = time.perf_counter()
+            model(img, imgsz=imgsz, device='cpu', verbose=False)
+            times.append((time.perf_counter() - start) * 1000)
+
+    times = np.array(times)
+    return {
+        "mean_ms": round(float(times.mean()), 2),
+        "p50_ms": round(float(np.percentile(times, 50)), 2),
+        "p95_ms": round(float(np.percentile(times, 95)), 2),
+        "samples": len(times)
+    }
+
+
+def measure_map(model, data, imgsz):
+    metrics = model.val(data=data, imgsz=imgsz, batch=1, device='cpu', plots=False, verbose=False)
+    return {"mAP50": round(float(metrics.box.map50), 4), "mAP50-95": round(float(metrics.box.map), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan latensi CPU dan mAP antar backend YOLO")
+    parser.add_argument('--weights', default='trained-nano-120epoch-dataset-II.pt')
+    parser.add_argument('--images', default='tes-gambar', help="Folder gambar untuk pengukuran latensi")
+    parser.add_argument('--data', help="Dataset yaml (format ultralytics) untuk mAP; dilewati bila kosong")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--int8', action='store_true', help="Tambahkan openvino INT8 ke perbandingan")
+    parser.add_argument('--calib', help="Folder gambar kalibrasi untuk INT8")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights):
+        print(f"[ERROR] File weights tidak ditemukan: {args.weights}")
+        return
+    images = load_images(args.images)
+    if not images:
+        print(f"[ERROR] Tidak ada gambar di: {args.images}")
+        return
+
+    variants = [(b, False) for b in args.backends]
+    if args.int8:
+        variants.append(('openvino', True))
+
+    results = []
+    for backend, int8 in variants:
+        name = backend + (' int8' if int8 else '')
+        print(f"\n[INFO] Backend: {name}")
+        try:
+            model = load_yolo(args.weights, backend, imgsz=args.imgsz, int8=int8, calib_dir=args.calib)
+            row = {"backend": name, **measure_latency(model, images, args.imgsz, args.runs)}
+            if args.data:
+                row.update(measure_map(model, args.data, args.imgsz))
+        except Exception as e:
+            print(f"[ERROR] {name}: {e}")
+            row = {"backend": name, "error": str(e)}
+        results.append(row)
+
+    print(f"\n{'Backend':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'mAP50':>10}{'mAP50-95':>10}")
+    for row in results:
+        if "error" in row:
+            print(f"{row['backend']:<15}  gagal: {row['error']}")
+            continue
+        print(f"{row['backend']:<15}{row['mean_ms']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row.get('mAP50', '-'):>10}{row.get('mAP50-95', '-'):>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"weights": args.weights, "imgsz": args.imgsz, "results": results}, f, indent=2)
+        print(f"\n[INFO] Hasil disimpan ke: {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
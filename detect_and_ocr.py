@@ -6,12 +6,32 @@ Mengekstrak number plate dan membaca teks dengan PaddleOCR
 """
 
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 from ultralytics import YOLO
 from paddleocr import PaddleOCR
 from pathlib import Path
 
+# Asosiasi rider/helm/plat dan OCR batch dipakai bersama dengan backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'helmet-detection-system', 'backend'))
+from association import associate_violations
+from plate_ocr import perform_ocr_batch
+from inference import weights_hash
+from ocr_cache import OCRCache
+from plate_quality import PlateQualityRouter, RAW, ENHANCED, DISCARD
+from plate_format import PlateValidator, FORMATS
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
 
 def load_models(yolo_weights_path):
     """
@@ -282,28 +302,85 @@ def perform_ocr(ocr_model, plate_img):
         return "", 0.0
 
 
-def detect_and_recognize(image_path, yolo_model, ocr_model, conf_threshold=0.25):
+def recognize_plates(ocr_model, plate_imgs, preprocess=False):
+    """OCR satu batch plat tanpa cache"""
+    if hasattr(ocr_model, 'recognize_batch'):
+        # Pool proses: preprocessing juga dikerjakan di worker
+        return ocr_model.recognize_batch(plate_imgs, preprocess=preprocess)
+    if preprocess:
+        plate_imgs = [preprocess_plate_image(img) for img in plate_imgs]
+    return perform_ocr_batch(ocr_model, plate_imgs)
+
+
+def ocr_plates(ocr_model, plate_imgs, cache=None, router=None, validator=None):
     """
-    Deteksi objek dan recognition plat nomor
+    OCR banyak plat nomor sekaligus (batch)
     
     Args:
-        image_path: Path ke gambar
-        yolo_model: YOLO model
-        ocr_model: PaddleOCR model
-        conf_threshold: Confidence threshold untuk deteksi
+        ocr_model: PaddleOCR model, atau ProcessOCRPool (OCR multi-proses)
+        plate_imgs: List gambar plat nomor
+        cache: OCRCache opsional; crop yang sudah pernah dibaca tidak di-OCR ulang
+        router: PlateQualityRouter opsional; skor kualitas menentukan satu jalur OCR
+                per crop (raw / enhanced) atau membuang crop yang tidak terbaca
+        validator: PlateValidator opsional; karakter mirip (0/O, 8/B, ...) dikoreksi
+                   sesuai posisi dan bacaan yang bukan format plat dibuang
     
     Returns:
-        Tuple (annotated_image, detections_dict)
+        List (text, confidence) sesuai urutan input
     """
-    # Baca gambar
-    image = cv2.imread(str(image_path))
-    if image is None:
-        print(f"[ERROR] Tidak dapat membaca gambar: {image_path}")
-        return None, None
-    
-    # Deteksi dengan YOLO
-    results = yolo_model(image, conf=conf_threshold, verbose=False)
+    if not plate_imgs:
+        return []
+    
+    def run(imgs, preprocess):
+        if cache is None:
+            return recognize_plates(ocr_model, imgs, preprocess)
+        return cache.recognize_batch(imgs, lambda missed: recognize_plates(ocr_model, missed, preprocess),
+                                     'preprocessed' if preprocess else 'raw')
+    
+    def fits(text):
+        return validator is None or (bool(text) and validator.correct(text) is not None)
+    
+    if router is not None:
+        routed = [router.route(img) for img in plate_imgs]
+        reads = [("", 0.0)] * len(plate_imgs)
+        for preprocess in (False, True):
+            idx = [i for i, (route, _) in enumerate(routed)
+                   if route != DISCARD and (route == ENHANCED) == preprocess]
+            if idx:
+                for i, read in zip(idx, run([plate_imgs[i] for i in idx], preprocess)):
+                    reads[i] = read
+        # Bacaan raw yang tidak sesuai format plat dicoba sekali lagi dengan preprocessing
+        retry = [i for i, (route, _) in enumerate(routed)
+                 if validator is not None and route == RAW and not fits(reads[i][0])]
+    else:
+        routed = None
+        reads = run(plate_imgs, False)
+        # Jika hasil kurang baik atau bukan format plat, coba lagi dengan preprocessing
+        retry = [i for i, (text, conf) in enumerate(reads) if conf < 0.7 or not fits(text)]
+    
+    if retry:
+        for i, (text2, conf2) in zip(retry, run([plate_imgs[i] for i in retry], True)):
+            # Utamakan bacaan yang sesuai format, lalu confidence tertinggi
+            if (fits(text2), conf2) > (fits(reads[i][0]), reads[i][1]):
+                reads[i] = (text2, conf2)
+    
+    if validator is not None:
+        checked = [(validator.check(text) if text else None, conf) for text, conf in reads]
+        reads = [(text, conf) if text else ("", 0.0) for text, conf in checked]
+    
+    if router is not None:
+        for (route, scores), (text, conf) in zip(routed, reads):
+            router.record(route, scores, text, round(float(conf), 3))
+    return reads
+
+
+def collect_detections(image, results, class_names):
+    """
+    Kumpulkan deteksi YOLO dari satu gambar
     
+    Returns:
+        Tuple (detections_dict, all_boxes, plate_imgs, plate_infos)
+    """
     # Dictionary untuk menyimpan hasil
     detections = {
         'with helmet': [],
@@ -312,9 +389,51 @@ def detect_and_recognize(image_path, yolo_model, ocr_model, conf_threshold=0.25)
         'number plate': []
     }
     
-    # Class names dari model
-    class_names = yolo_model.names
+    # Kumpulkan semua deteksi terlebih dahulu
+    all_boxes = []
+    plate_imgs = []
+    plate_infos = []
+    
+    for result in results:
+        # Satu transfer tensor per hasil: x1, y1, x2, y2, conf, cls
+        for x1, y1, x2, y2, conf, cls_id in result.boxes.data.cpu().numpy()[:, [0, 1, 2, 3, -2, -1]]:
+            class_name = class_names[int(cls_id)]
+            
+            # Simpan deteksi
+            detection_info = {
+                'bbox': [float(x1), float(y1), float(x2), float(y2)],
+                'confidence': float(conf)
+            }
+            
+            if class_name in detections:
+                # Plat nomor dikumpulkan untuk OCR batch
+                if class_name == 'number plate':
+                    plate_imgs.append(extract_license_plate(image, [x1, y1, x2, y2]))
+                    plate_infos.append(detection_info)
+                
+                detections[class_name].append(detection_info)
+            
+            all_boxes.append((class_name, detection_info))
+    
+    return detections, all_boxes, plate_imgs, plate_infos
+
+
+def apply_ocr(plate_infos, reads, verbose=True):
+    """Tempelkan hasil OCR ke deteksi plat nomor"""
+    for plate_count, (detection_info, (text, ocr_conf)) in enumerate(zip(plate_infos, reads), 1):
+        detection_info['ocr_text'] = text
+        detection_info['ocr_confidence'] = ocr_conf
+        if verbose:
+            print(f"[PLATE {plate_count}] Detected: '{text}' (conf: {ocr_conf:.2f})")
+
+
+def annotate_detections(image, detections, all_boxes):
+    """
+    Gambar bounding box dan tambahkan daftar pelanggaran ke detections
     
+    Returns:
+        Annotated image
+    """
     # Annotated image
     annotated = image.copy()
     
@@ -326,157 +445,344 @@ def detect_and_recognize(image_path, yolo_model, ocr_model, conf_threshold=0.25)
         'number plate': (0, 0, 255)       # Merah
     }
     
-    plate_count = 0
-    
-    for result in results:
-        boxes = result.boxes
+    for class_name, detection_info in all_boxes:
+        x1, y1, x2, y2 = detection_info['bbox']
+        conf = detection_info['confidence']
         
-        for box in boxes:
-            # Ambil informasi box
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            conf = float(box.conf[0].cpu().numpy())
-            cls_id = int(box.cls[0].cpu().numpy())
-            class_name = class_names[cls_id]
-            
-            # Simpan deteksi
-            detection_info = {
-                'bbox': [x1, y1, x2, y2],
-                'confidence': conf
-            }
-            
-            if class_name in detections:
-                # Jika number plate, lakukan OCR
-                if class_name == 'number plate':
-                    plate_count += 1
-                    
-                    # Ekstrak plat nomor
-                    plate_img = extract_license_plate(image, [x1, y1, x2, y2])
-                    
-                    # OCR pada gambar asli
-                    text, ocr_conf = perform_ocr(ocr_model, plate_img)
-                    
-                    # Jika hasil kurang baik, coba dengan preprocessing
-                    if ocr_conf < 0.7:
-                        preprocessed = preprocess_plate_image(plate_img)
-                        text2, ocr_conf2 = perform_ocr(ocr_model, preprocessed)
-                        if ocr_conf2 > ocr_conf:
-                            text, ocr_conf = text2, ocr_conf2
-                    
-                    detection_info['ocr_text'] = text
-                    detection_info['ocr_confidence'] = ocr_conf
-                    
-                    print(f"[PLATE {plate_count}] Detected: '{text}' (conf: {ocr_conf:.2f})")
-                
-                detections[class_name].append(detection_info)
-            
-            # Draw bounding box
-            color = colors.get(class_name, (255, 255, 255))
-            cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-            
-            # Label
-            label = f"{class_name}: {conf:.2f}"
-            if class_name == 'number plate' and 'ocr_text' in detection_info:
-                label += f" [{detection_info['ocr_text']}]"
-            
-            # Background untuk label
-            (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            cv2.rectangle(annotated, (int(x1), int(y1) - label_h - 10), 
-                         (int(x1) + label_w, int(y1)), color, -1)
-            cv2.putText(annotated, label, (int(x1), int(y1) - 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        # Draw bounding box
+        color = colors.get(class_name, (255, 255, 255))
+        cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+        
+        # Label
+        label = f"{class_name}: {conf:.2f}"
+        if class_name == 'number plate' and 'ocr_text' in detection_info:
+            label += f" [{detection_info['ocr_text']}]"
+        
+        # Background untuk label
+        (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        cv2.rectangle(annotated, (int(x1), int(y1) - label_h - 10), 
+                     (int(x1) + label_w, int(y1)), color, -1)
+        cv2.putText(annotated, label, (int(x1), int(y1) - 5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    
+    # Asosiasi pelanggaran: tanpa helm -> rider -> plat nomor
+    boxes = {name: np.array([d['bbox'] for d in items], dtype=np.float32).reshape(-1, 4)
+             for name, items in detections.items()}
+    detections['violations'] = []
+    for v in associate_violations(boxes['without helmet'], boxes['rider'], boxes['number plate']):
+        plate = detections['number plate'][v.plate] if v.plate is not None else None
+        detections['violations'].append({
+            'head': detections['without helmet'][v.head],
+            'rider': detections['rider'][v.rider],
+            'plate': plate,
+            'ocr_text': plate.get('ocr_text', '') if plate else ''
+        })
+    
+    return annotated
+
+
+def detect_and_recognize(image_path, yolo_model, ocr_model, conf_threshold=0.25):
+    """
+    Deteksi objek dan recognition plat nomor
     
+    Args:
+        image_path: Path ke gambar
+        yolo_model: YOLO model
+        ocr_model: PaddleOCR model
+        conf_threshold: Confidence threshold untuk deteksi
+    
+    Returns:
+        Tuple (annotated_image, detections_dict)
+    """
+    # Baca gambar
+    image = cv2.imread(str(image_path))
+    if image is None:
+        print(f"[ERROR] Tidak dapat membaca gambar: {image_path}")
+        return None, None
+    
+    # Deteksi dengan YOLO
+    results = yolo_model(image, conf=conf_threshold, verbose=False)
+    detections, all_boxes, plate_imgs, plate_infos = collect_detections(image, results, yolo_model.names)
+    
+    # OCR semua plat dalam satu panggilan model
+    apply_ocr(plate_infos, ocr_plates(ocr_model, plate_imgs))
+    
+    annotated = annotate_detections(image, detections, all_boxes)
     return annotated, detections
 
 
-def process_directory(input_dir, yolo_model, ocr_model, output_dir="output"):
+def scan_images(input_dir):
+    """Satu kali scan direktori; ekstensi dicocokkan tanpa memperhatikan huruf besar/kecil"""
+    with os.scandir(input_dir) as entries:
+        paths = [Path(e.path) for e in entries
+                 if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTENSIONS]
+    return sorted(paths)
+
+
+def load_manifest(manifest_path):
+    """Manifest checkpoint: nama file -> entri terakhir (sha1, model, ringkasan)"""
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Baris terakhir bisa terpotong jika proses sebelumnya terhenti
+                    continue
+                manifest[entry['file']] = entry
+    return manifest
+
+
+def model_version_of(yolo_model):
+    ckpt = getattr(yolo_model, 'ckpt_path', None)
+    if ckpt and os.path.exists(ckpt):
+        return weights_hash(ckpt)[:16]
+    return 'unknown'
+
+
+def read_image(path, manifest, model_version):
+    """
+    Tahap decode (berjalan di thread pool).
+    Returns (path, sha1, image, skipped); image None jika dilewati atau rusak
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    sha1 = hashlib.sha1(data).hexdigest()
+    
+    entry = manifest.get(path.name)
+    if entry and entry.get('sha1') == sha1 and entry.get('model') == model_version:
+        return path, sha1, None, True
+    
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        print(f"[ERROR] Tidak dapat membaca gambar: {path}")
+    return path, sha1, image, False
+
+
+def print_summary(detections):
+    # Ringkasan deteksi
+    print(f"\n[SUMMARY]")
+    print(f"  - With Helmet: {len(detections['with helmet'])} terdeteksi")
+    print(f"  - Without Helmet: {len(detections['without helmet'])} terdeteksi")
+    print(f"  - Rider: {len(detections['rider'])} terdeteksi")
+    print(f"  - Number Plate: {len(detections['number plate'])} terdeteksi")
+    print(f"  - Pelanggaran (tanpa helm): {len(detections['violations'])}")
+    
+    # Detail plat nomor
+    for i, plate in enumerate(detections['number plate'], 1):
+        print(f"\n  [Number Plate {i}]")
+        print(f"    OCR Text: {plate.get('ocr_text', 'N/A')}")
+        print(f"    OCR Confidence: {plate.get('ocr_confidence', 0):.2%}")
+    
+    # Detail pelanggaran
+    for i, violation in enumerate(detections['violations'], 1):
+        plate_text = violation['ocr_text'] or 'plat tidak terdeteksi'
+        print(f"\n  [Pelanggaran {i}] {plate_text}")
+
+
+def process_directory(input_dir, yolo_model, ocr_model, output_dir="output", batch_size=8,
+                      decode_workers=4, write_workers=2, conf_threshold=0.25, resume=True,
+                      model_version=None, verbose=True, ocr_cache=None, quality_router=None,
+                      plate_validator=None):
     """
-    Proses semua gambar dalam direktori
+    Proses semua gambar dalam direktori secara pipeline:
+      decode (thread pool, prefetch) -> YOLO batch -> OCR (thread terpisah) -> tulis hasil (async)
+    
+    Manifest checkpoint (output_dir/manifest.jsonl) mencatat hash isi setiap
+    gambar dan versi model; saat dijalankan ulang, gambar yang tidak berubah
+    dilewati.
     """
     # Buat output directory
     os.makedirs(output_dir, exist_ok=True)
     
-    # Supported extensions
-    extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
-    
-    # Cari semua gambar (case-insensitive, tanpa duplikat)
-    image_paths = []
-    seen = set()
-    for ext in extensions:
-        for p in Path(input_dir).glob(f"*{ext}"):
-            if p.name.lower() not in seen:
-                seen.add(p.name.lower())
-                image_paths.append(p)
-        for p in Path(input_dir).glob(f"*{ext.upper()}"):
-            if p.name.lower() not in seen:
-                seen.add(p.name.lower())
-                image_paths.append(p)
-    
+    image_paths = scan_images(input_dir)
     if not image_paths:
         print(f"[WARNING] Tidak ada gambar ditemukan di: {input_dir}")
         return
     
-    print(f"\n[INFO] Ditemukan {len(image_paths)} gambar untuk diproses\n")
+    model_version = model_version or model_version_of(yolo_model)
+    manifest_path = os.path.join(output_dir, 'manifest.jsonl')
+    manifest = load_manifest(manifest_path) if resume else {}
+    
+    print(f"\n[INFO] Ditemukan {len(image_paths)} gambar untuk diproses (model {model_version})\n")
     print("=" * 60)
     
     all_results = {}
+    manifest_lock = threading.Lock()
+    decode_pool = ThreadPoolExecutor(max_workers=decode_workers)
+    # PaddleOCR tidak thread-safe: satu thread OCR, paralel dengan YOLO batch berikutnya
+    ocr_pool = ThreadPoolExecutor(max_workers=1)
+    write_pool = ThreadPoolExecutor(max_workers=write_workers)
+    stats = {'processed': 0, 'skipped': 0, 'failed': 0}
+    start_time = time.time()
+    
+    def write_result(img_path, sha1, annotated, detections):
+        output_path = os.path.join(output_dir, f"result_{img_path.name}")
+        if not cv2.imwrite(output_path, annotated):
+            print(f"[ERROR] Gagal menyimpan: {output_path}")
+            return
+        entry = {
+            'file': img_path.name,
+            'sha1': sha1,
+            'model': model_version,
+            'output': output_path,
+            'plates': [p.get('ocr_text', '') for p in detections['number plate']],
+            'violations': [v['ocr_text'] for v in detections['violations']]
+        }
+        # Dicatat setelah gambar tersimpan, jadi proses yang terhenti tidak menandai gambar setengah jadi
+        with manifest_lock, open(manifest_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        if verbose:
+            print(f"[SAVED] Hasil disimpan ke: {output_path}")
     
-    for idx, img_path in enumerate(image_paths, 1):
-        print(f"\n[{idx}/{len(image_paths)}] Processing: {img_path.name}")
-        print("-" * 40)
+    def finish_batch(batch):
+        # OCR semua plat dari satu batch gambar dalam satu panggilan model
+        plate_imgs = [img for item in batch for img in item[3][2]]
+        reads = iter(ocr_plates(ocr_model, plate_imgs, ocr_cache, quality_router, plate_validator))
+        for img_path, sha1, image, (detections, all_boxes, crops, plate_infos) in batch:
+            apply_ocr(plate_infos, [next(reads) for _ in crops], verbose=verbose)
+            annotated = annotate_detections(image, detections, all_boxes)
+            if verbose:
+                print(f"\n[{img_path.name}]")
+                print_summary(detections)
+            all_results[str(img_path)] = detections
+            write_pool.submit(write_result, img_path, sha1, annotated, detections)
+    
+    # Prefetch terbatas supaya memori tetap kecil untuk puluhan ribu gambar
+    pending_paths = deque(image_paths)
+    decoding = deque()
+    ocr_jobs = deque()
+    
+    def refill():
+        while pending_paths and len(decoding) < batch_size * 2:
+            decoding.append(decode_pool.submit(read_image, pending_paths.popleft(), manifest, model_version))
+    
+    refill()
+    while decoding:
+        batch = []
+        while decoding and len(batch) < batch_size:
+            img_path, sha1, image, skipped = decoding.popleft().result()
+            refill()
+            if image is not None:
+                batch.append((img_path, sha1, image))
+            elif skipped:
+                stats['skipped'] += 1
+            else:
+                stats['failed'] += 1
+        if not batch:
+            continue
         
-        # Deteksi dan OCR
-        annotated, detections = detect_and_recognize(img_path, yolo_model, ocr_model)
+        # Deteksi YOLO untuk seluruh batch dalam satu panggilan
+        results = yolo_model([image for _, _, image in batch], conf=conf_threshold, verbose=False)
+        batch = [(img_path, sha1, image, collect_detections(image, [result], yolo_model.names))
+                 for (img_path, sha1, image), result in zip(batch, results)]
+        stats['processed'] += len(batch)
         
-        if annotated is not None:
-            # Simpan hasil
-            output_path = os.path.join(output_dir, f"result_{img_path.name}")
-            cv2.imwrite(output_path, annotated)
-            print(f"[SAVED] Hasil disimpan ke: {output_path}")
-            
-            # Ringkasan deteksi
-            print(f"\n[SUMMARY]")
-            print(f"  - With Helmet: {len(detections['with helmet'])} terdeteksi")
-            print(f"  - Without Helmet: {len(detections['without helmet'])} terdeteksi")
-            print(f"  - Rider: {len(detections['rider'])} terdeteksi")
-            print(f"  - Number Plate: {len(detections['number plate'])} terdeteksi")
-            
-            # Detail plat nomor
-            for i, plate in enumerate(detections['number plate'], 1):
-                print(f"\n  [Number Plate {i}]")
-                print(f"    OCR Text: {plate.get('ocr_text', 'N/A')}")
-                print(f"    OCR Confidence: {plate.get('ocr_confidence', 0):.2%}")
-            
-            all_results[str(img_path)] = detections
+        ocr_jobs.append(ocr_pool.submit(finish_batch, batch))
+        # Batasi batch yang menunggu OCR
+        while len(ocr_jobs) > 2:
+            ocr_jobs.popleft().result()
+        
+        done = stats['processed'] + stats['skipped'] + stats['failed']
+        print(f"[PROGRESS] {done}/{len(image_paths)} gambar "
+              f"({stats['processed'] / (time.time() - start_time):.1f} gambar/detik)")
     
+    for job in ocr_jobs:
+        job.result()
+    for pool in (decode_pool, ocr_pool, write_pool):
+        pool.shutdown(wait=True)
+    
+    elapsed = time.time() - start_time
     print("\n" + "=" * 60)
-    print("[DONE] Semua gambar telah diproses!")
+    print(f"[DONE] Diproses: {stats['processed']}, dilewati (tidak berubah): {stats['skipped']}, "
+          f"gagal: {stats['failed']} dalam {elapsed:.1f} detik")
+    if ocr_cache is not None:
+        cache_stats = ocr_cache.stats()
+        print(f"[OCR CACHE] hit rate {cache_stats['hit_rate']:.0%} "
+              f"(hit: {cache_stats['hits'] + cache_stats['disk_hits']}, miss: {cache_stats['misses']})")
+    if quality_router is not None:
+        routes = quality_router.stats()
+        print(f"[KUALITAS PLAT] raw: {routes['raw']}, enhanced: {routes['enhanced']}, dibuang: {routes['discard']}")
+    if plate_validator is not None:
+        checks = plate_validator.stats()
+        print(f"[FORMAT PLAT] valid: {checks['valid']}, dikoreksi: {checks['corrected']}, ditolak: {checks['rejected']}")
     
     return all_results
 
 
 def main():
-    # Konfigurasi path
-    YOLO_WEIGHTS = "trained-small-40epoch-dataset-II.pt"
-    TEST_IMAGES_DIR = "tes-gambar"
-    OUTPUT_DIR = "output"
+    parser = argparse.ArgumentParser(description="Deteksi helm + OCR plat nomor untuk satu direktori gambar")
+    parser.add_argument('--weights', default="trained-small-40epoch-dataset-II.pt")
+    parser.add_argument('--input', default="tes-gambar")
+    parser.add_argument('--output', default="output")
+    parser.add_argument('--batch-size', type=int, default=8, help="Jumlah gambar per panggilan YOLO")
+    parser.add_argument('--decode-workers', type=int, default=4, help="Thread untuk membaca/decode gambar")
+    parser.add_argument('--ocr-workers', type=int, default=1,
+                        help="Lebih dari 1: OCR dijalankan di beberapa proses PaddleOCR")
+    parser.add_argument('--write-workers', type=int, default=2, help="Thread untuk menyimpan hasil")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--no-resume', action='store_true', help="Abaikan manifest, proses ulang semua gambar")
+    parser.add_argument('--quiet', action='store_true', help="Tanpa ringkasan per gambar")
+    parser.add_argument('--ocr-cache', help="File cache OCR (default: <output>/ocr_cache.db)")
+    parser.add_argument('--no-ocr-cache', action='store_true')
+    parser.add_argument('--quality-log', help="Log skor kualitas plat (default: <output>/plate_quality.jsonl)")
+    parser.add_argument('--no-quality-routing', action='store_true',
+                        help="OCR raw lalu ulang dengan preprocessing, tanpa skor kualitas")
+    parser.add_argument('--plate-formats', nargs='*', default=['id'], choices=sorted(FORMATS),
+                        help="Format plat yang diterima (kosongkan untuk menonaktifkan validasi)")
+    args = parser.parse_args()
     
     # Verifikasi file exists
-    if not os.path.exists(YOLO_WEIGHTS):
-        print(f"[ERROR] File weights tidak ditemukan: {YOLO_WEIGHTS}")
+    if not os.path.exists(args.weights):
+        print(f"[ERROR] File weights tidak ditemukan: {args.weights}")
         return
     
-    if not os.path.exists(TEST_IMAGES_DIR):
-        print(f"[ERROR] Direktori gambar tidak ditemukan: {TEST_IMAGES_DIR}")
+    if not os.path.exists(args.input):
+        print(f"[ERROR] Direktori gambar tidak ditemukan: {args.input}")
         return
     
     # Load models
-    yolo_model, ocr_model = load_models(YOLO_WEIGHTS)
+    if args.ocr_workers > 1:
+        from ocr_pool import ProcessOCRPool
+        print(f"[INFO] Loading YOLO model dari: {args.weights}")
+        yolo_model = YOLO(args.weights)
+        ocr_model = ProcessOCRPool(workers=args.ocr_workers, lang='en')
+    else:
+        yolo_model, ocr_model = load_models(args.weights)
     
     # Print class names
     print(f"\n[INFO] Class yang terdeteksi: {yolo_model.names}")
     
+    # Cache OCR di disk: crop yang sama tidak di-OCR ulang saat dijalankan kembali
+    ocr_cache = None
+    if not args.no_ocr_cache:
+        ocr_cache = OCRCache(disk_path=args.ocr_cache or os.path.join(args.output, 'ocr_cache.db'),
+                             settings='paddleocr-en')
+    
+    # Skor kualitas crop: satu jalur OCR per plat, skor dicatat untuk menyetel ambang
+    quality_router = None
+    if not args.no_quality_routing:
+        os.makedirs(args.output, exist_ok=True)
+        quality_router = PlateQualityRouter(log_path=args.quality_log or os.path.join(args.output, 'plate_quality.jsonl'))
+    
+    plate_validator = PlateValidator(args.plate_formats) if args.plate_formats else None
+    
     # Proses gambar
-    results = process_directory(TEST_IMAGES_DIR, yolo_model, ocr_model, OUTPUT_DIR)
+    try:
+        results = process_directory(args.input, yolo_model, ocr_model, args.output,
+                                    batch_size=args.batch_size, decode_workers=args.decode_workers,
+                                    write_workers=args.write_workers, conf_threshold=args.conf,
+                                    resume=not args.no_resume, model_version=weights_hash(args.weights)[:16],
+                                    verbose=not args.quiet, ocr_cache=ocr_cache,
+                                    quality_router=quality_router, plate_validator=plate_validator)
+    finally:
+        if ocr_cache is not None:
+            ocr_cache.close()
+        if quality_router is not None:
+            quality_router.close()
+        if hasattr(ocr_model, 'close'):
+            ocr_model.close()
     
     return results
 
@@ -0,0 +1,149 @@
+import threading
+import time
+
+
+class AdaptiveController:
+    """
+    Keeps the per-frame cost of the detect loop under a latency budget.
+
+    Stage times are smoothed with an EMA. The frame cost is the YOLO time
+    amortised over the detection stride plus every other stage. Over budget,
+    the knob that acts on the dominant cost is degraded:
+      - YOLO-bound:  YOLO imgsz (walk down imgsz_ladder), then detect stride
+                     (reuse detections between YOLO runs)
+      - otherwise:   OCR sampling (observe plate crops every Nth frame) first
+    with the remaining knobs as fallbacks. A backed-up OCR queue alone only
+    lowers OCR sampling. Knobs are restored stride -> imgsz -> OCR sampling
+    once the cost falls below headroom * budget. A cooldown between
+    decisions lets the EMA settle on the new setting.
+
+    record() is called from OCR worker threads as well as the detect loop,
+    so the stage table is guarded by a lock.
+    """
+
+    def __init__(self, budget_ms=100.0, imgsz_ladder=(320, 416, 512, 640), max_stride=4,
+                 max_ocr_every=4, alpha=0.2, headroom=0.6, cooldown=15):
+        self.budget_ms = budget_ms
+        self.imgsz_ladder = sorted(imgsz_ladder)
+        self.max_stride = max_stride
+        self.max_ocr_every = max_ocr_every
+        self.alpha = alpha
+        self.headroom = headroom
+        self.cooldown = cooldown
+
+        self.stride = 1
+        self.ocr_every = 1
+        self.size_idx = len(self.imgsz_ladder) - 1
+        self.lock = threading.RLock()
+        self.stages = {}
+        self.frames = 0
+        self.since_change = 0
+        self.decisions = 0
+        self.last_decision = None
+
+    @property
+    def imgsz(self):
+        return self.imgsz_ladder[self.size_idx]
+
+    def record(self, stage, seconds):
+        ms = 1000.0 * seconds
+        with self.lock:
+            prev = self.stages.get(stage)
+            self.stages[stage] = ms if prev is None else prev + self.alpha * (ms - prev)
+
+    def should_detect(self, frame_idx):
+        return frame_idx % self.stride == 0
+
+    def should_sample_ocr(self, frame_idx):
+        return frame_idx % self.ocr_every == 0
+
+    def yolo_ms(self):
+        with self.lock:
+            return self.stages.get('yolo', 0.0) / self.stride
+
+    def frame_ms(self):
+        with self.lock:
+            other = sum(v for k, v in self.stages.items() if k not in ('yolo', 'ocr'))
+            return self.yolo_ms() + other
+
+    def step(self, ocr_backlog=0.0):
+        """
+        Call once per frame after the stages are recorded.
+        ocr_backlog: OCR queue fill ratio (0..1); a backed-up queue also
+        lowers OCR sampling, since OCR competes for the same cores.
+        """
+        with self.lock:
+            self.frames += 1
+            self.since_change += 1
+            if self.since_change < self.cooldown or 'yolo' not in self.stages:
+                return
+
+            cost = self.frame_ms()
+            reason = f"frame {cost:.1f}ms, budget {self.budget_ms:.1f}ms, ocr backlog {ocr_backlog:.0%}"
+            if cost > self.budget_ms or ocr_backlog > 0.75:
+                self._degrade(cost > self.budget_ms, reason)
+            elif cost < self.headroom * self.budget_ms and ocr_backlog < 0.25:
+                self._restore(reason)
+
+    def _degrade(self, over_budget, reason):
+        if not over_budget:
+            # Only the OCR queue is backed up
+            knobs = ['ocr_every']
+        elif self.yolo_ms() >= self.frame_ms() - self.yolo_ms():
+            knobs = ['imgsz', 'stride', 'ocr_every']
+        else:
+            knobs = ['ocr_every', 'imgsz', 'stride']
+
+        for knob in knobs:
+            if knob == 'ocr_every' and self.ocr_every < self.max_ocr_every:
+                self._change('ocr_every', self.ocr_every, self.ocr_every * 2, reason)
+                return
+            if knob == 'imgsz' and self.size_idx > 0:
+                self._change('imgsz', self.imgsz, self.imgsz_ladder[self.size_idx - 1], reason)
+                self.size_idx -= 1
+                # Old YOLO timings no longer apply at the new input size
+                self.stages.pop('yolo', None)
+                return
+            if knob == 'stride' and self.stride < self.max_stride:
+                self._change('stride', self.stride, self.stride + 1, reason)
+                return
+
+    def _restore(self, reason):
+        if self.stride > 1:
+            yolo = self.stages['yolo']
+            if self.frame_ms() + yolo / (self.stride - 1) - yolo / self.stride >= self.budget_ms:
+                return
+            self._change('stride', self.stride, self.stride - 1, reason)
+        elif self.size_idx < len(self.imgsz_ladder) - 1:
+            # Only step up if the larger input is expected to fit
+            scale = (self.imgsz_ladder[self.size_idx + 1] / self.imgsz) ** 2
+            if self.frame_ms() + self.stages['yolo'] * (scale - 1) >= self.budget_ms:
+                return
+            self._change('imgsz', self.imgsz, self.imgsz_ladder[self.size_idx + 1], reason)
+            self.size_idx += 1
+            self.stages.pop('yolo', None)
+        elif self.ocr_every > 1:
+            self._change('ocr_every', self.ocr_every, self.ocr_every // 2, reason)
+
+    def _change(self, knob, old, new, reason):
+        if knob == 'stride':
+            self.stride = new
+        elif knob == 'ocr_every':
+            self.ocr_every = new
+        self.since_change = 0
+        self.decisions += 1
+        self.last_decision = {"time": time.time(), "knob": knob, "from": old, "to": new, "reason": reason}
+        print(f"[ADAPT] {knob} {old} -> {new} ({reason})")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "budget_ms": self.budget_ms,
+                "frame_ms": round(self.frame_ms(), 1),
+                "stages_ms": {k: round(v, 1) for k, v in self.stages.items()},
+                "stride": self.stride,
+                "imgsz": self.imgsz,
+                "ocr_every": self.ocr_every,
+                "decisions": self.decisions,
+                "last_decision": self.last_decision
+            }
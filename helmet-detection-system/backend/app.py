@@ -4,10 +4,11 @@ import os
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["ETag"])
     
     # Ensure static directories exist
     os.makedirs(os.path.join(app.root_path, 'static', 'crops'), exist_ok=True)
+    os.makedirs(os.path.join(app.root_path, 'static', 'clips'), exist_ok=True)
     os.makedirs(os.path.join(app.root_path, 'logs'), exist_ok=True)
 
     from routes import api
@@ -17,4 +18,10 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
+    # Cameras from CAMERAS are monitored from startup, not from the first viewer.
+    # The debug reloader runs this file twice; only the serving process opens them
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from routes import start_monitoring
+        with app.app_context():
+            start_monitoring()
     app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,132 @@
+"""
+Rider / helmet / plate association on whole box arrays.
+
+Boxes are (N, 4) xyxy arrays. Every pairwise relation is computed at once with
+NumPy broadcasting. Every head is paired with its best rider (a driver and a
+passenger may share one), and the rider -> plate pairing is solved as an
+assignment problem, so each rider gets at most one plate.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Indices into the head / rider / plate arrays; plate is None when no plate matched
+Violation = namedtuple('Violation', ['head', 'rider', 'plate'])
+
+
+def _as_boxes(boxes):
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def box_area(boxes):
+    boxes = _as_boxes(boxes)
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def intersection_matrix(a, b):
+    a, b = _as_boxes(a), _as_boxes(b)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+
+def iou_matrix(a, b):
+    inter = intersection_matrix(a, b)
+    union = box_area(a)[:, None] + box_area(b)[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def coverage_matrix(inner, outer):
+    """Fraction of each inner box that lies inside each outer box."""
+    return intersection_matrix(inner, outer) / np.maximum(box_area(inner)[:, None], 1e-6)
+
+
+def containment_matrix(inner, outer):
+    """True where the centre of inner[i] lies inside outer[j]."""
+    inner, outer = _as_boxes(inner), _as_boxes(outer)
+    cx = ((inner[:, 0] + inner[:, 2]) / 2)[:, None]
+    cy = ((inner[:, 1] + inner[:, 3]) / 2)[:, None]
+    return ((outer[None, :, 0] <= cx) & (cx <= outer[None, :, 2]) &
+            (outer[None, :, 1] <= cy) & (cy <= outer[None, :, 3]))
+
+
+def assign(score, min_score=0.0, method='hungarian'):
+    """
+    Maximum-score one-to-one matching of rows to columns.
+    Returns (row, col) pairs whose score is above min_score.
+    Falls back to greedy-by-score when SciPy is unavailable.
+    """
+    score = np.asarray(score, dtype=np.float32)
+    if score.size == 0:
+        return []
+
+    if method == 'hungarian' and linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-score)
+        return [(int(r), int(c)) for r, c in zip(rows, cols) if score[r, c] > min_score]
+
+    pairs = []
+    used_rows, used_cols = set(), set()
+    flat_order = np.argsort(-score, axis=None)
+    for r, c in zip(*np.unravel_index(flat_order, score.shape)):
+        if score[r, c] <= min_score:
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((int(r), int(c)))
+    return pairs
+
+
+def head_rider_scores(heads, riders):
+    # A head whose centre is inside the rider always beats plain overlap;
+    # overlap alone is kept as the fallback for loosely drawn rider boxes.
+    contained = containment_matrix(heads, riders)
+    return np.where(contained, 1.0 + coverage_matrix(heads, riders), iou_matrix(heads, riders))
+
+
+def plate_rider_scores(plates, riders):
+    contained = containment_matrix(plates, riders)
+    return np.where(contained, coverage_matrix(plates, riders) + iou_matrix(plates, riders), 0.0)
+
+
+def best_rider(heads, riders, min_score=0.0):
+    """(head, rider) pairs: each head's highest-scoring rider, if above min_score."""
+    scores = head_rider_scores(heads, riders)
+    best = scores.argmax(axis=1)
+    keep = scores[np.arange(len(heads)), best] > min_score
+    return [(int(h), int(best[h])) for h in np.flatnonzero(keep)]
+
+
+def associate_violations(heads, riders, plates, method='hungarian'):
+    """
+    Pair every 'without helmet' head with its best rider, then give each of
+    those riders its best plate. Several heads (driver and passenger) can
+    share a rider and therefore a plate.
+
+    Returns a list of Violation(head, rider, plate) index tuples ordered by head.
+    """
+    heads, riders, plates = _as_boxes(heads), _as_boxes(riders), _as_boxes(plates)
+    if len(heads) == 0 or len(riders) == 0:
+        return []
+
+    head_to_rider = best_rider(heads, riders)
+    if not head_to_rider:
+        return []
+
+    matched_riders = np.unique([r for _, r in head_to_rider])
+    rider_to_plate = {}
+    if len(plates):
+        scores = plate_rider_scores(plates, riders[matched_riders]).T
+        for row, plate in assign(scores, method=method):
+            rider_to_plate[int(matched_riders[row])] = plate
+
+    return sorted(Violation(h, r, rider_to_plate.get(r)) for h, r in head_to_rider)
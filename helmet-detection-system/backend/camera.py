@@ -1,18 +1,43 @@
 import cv2
 import threading
 import time
+from metrics import REGISTRY
 
 class VideoCamera:
-    def __init__(self, source=0):
+    def __init__(self, source=0, threaded=None):
         """
         source: 
           - int for webcam index (e.g. 0)
           - str for file path or RTSP url
+        threaded:
+          - True to decode on a background thread and keep only the newest frame
+          - None (default) enables it automatically for RTSP sources
         """
         self.source = source
+        self.threaded = threaded
         self.lock = threading.Lock()
         self.video = None
+
+        # Grabber state (latest-frame-wins)
+        self.frame_ready = threading.Condition()
+        self.latest_frame = None
+        self.latest_seq = 0
+        self.consumed_seq = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.grabber = None
+        self.grabbing = False
+
         self._open_video()
+        self._update_grabber()
+
+    def _is_rtsp(self):
+        return isinstance(self.source, str) and self.source.startswith('rtsp')
+
+    def _use_grabber(self):
+        if self.threaded is None:
+            return self._is_rtsp()
+        return bool(self.threaded)
 
     def _open_video(self):
         if self.video is not None and self.video.isOpened():
@@ -30,17 +55,90 @@ class VideoCamera:
             print(f"[ERROR] Could not open video source: {self.source}")
         else:
             print(f"[INFO] Video source opened successfully: {self.source}")
+            if self._use_grabber():
+                # Keep OpenCV's own queue short; the grabber thread does the buffering
+                self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
     def __del__(self):
-        if self.video and self.video.isOpened():
-            self.video.release()
+        self.release()
+
+    def release(self):
+        """
+        Stop the grabber thread and close the capture. The grabber thread holds
+        a reference to the camera, so __del__ never runs while it is alive:
+        owners must call this when they drop or replace a camera.
+        """
+        self.grabbing = False
+        if self.grabber is not None and self.grabber is not threading.current_thread():
+            self.grabber.join(timeout=1.0)
+        with self.lock:
+            if self.video is not None and self.video.isOpened():
+                self.video.release()
+            self.video = None
+
+    def _update_grabber(self):
+        if self._use_grabber():
+            self.grabbing = True
+            if self.grabber is None or not self.grabber.is_alive():
+                self.grabber = threading.Thread(target=self._grab_loop, daemon=True)
+                self.grabber.start()
+        else:
+            self.grabbing = False
+
+    def _grab_loop(self):
+        """Decode continuously so the capture buffer never backs up behind inference."""
+        while self.grabbing:
+            start = time.time()
+            frame = self._read_frame()
+            if frame is None:
+                time.sleep(0.1)
+                continue
+
+            with self.frame_ready:
+                if self.latest_seq > self.consumed_seq:
+                    self.frames_dropped += 1
+                self.latest_frame = frame
+                self.latest_seq += 1
+                self.frames_read += 1
+                self.frame_ready.notify_all()
+
+            # Files decode faster than real time; pace them to their native FPS
+            if isinstance(self.source, str) and not self._is_rtsp():
+                fps = self._source_fps() or 25
+                time.sleep(max(0, 1.0 / fps - (time.time() - start)))
+
+    def _source_fps(self):
+        with self.lock:
+            if self.video is None or not self.video.isOpened():
+                return 0
+            return self.video.get(cv2.CAP_PROP_FPS)
+
+    def get_frame(self, timeout=1.0):
+        if not self._use_grabber():
+            return self._read_frame()
+
+        with self.frame_ready:
+            if not self.frame_ready.wait_for(lambda: self.latest_seq > self.consumed_seq, timeout):
+                return None
+            self.consumed_seq = self.latest_seq
+            return self.latest_frame
+
+    def get_stats(self):
+        with self.frame_ready:
+            return {
+                "threaded": self._use_grabber(),
+                "frames_read": self.frames_read,
+                "frames_dropped": self.frames_dropped,
+            }
 
-    def get_frame(self):
+    def _read_frame(self):
         with self.lock:
             if self.video is None or not self.video.isOpened():
                 return None
             
+            start = time.perf_counter()
             success, frame = self.video.read()
+            REGISTRY.observe('capture', time.perf_counter() - start)
             if not success:
                 if isinstance(self.source, int):
                      print(f"[WARNING] Failed to read frame from webcam {self.source}")
@@ -63,3 +161,7 @@ class VideoCamera:
                  return
             self.source = new_source
             self._open_video()
+        with self.frame_ready:
+            self.latest_frame = None
+            self.consumed_seq = self.latest_seq
+        self._update_grabber()
@@ -0,0 +1,47 @@
+import threading
+from camera import VideoCamera
+
+
+class CameraRegistry:
+    """
+    Named VideoCamera instances, one per monitored stream.
+    Cameras decode on their own grabber threads so the batched pipeline can
+    collect the newest frame of every stream without blocking on any of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cameras = {}
+
+    def add(self, camera_id, source, threaded=True):
+        """Register a camera, or replace an existing one with a new source."""
+        with self.lock:
+            old = self.cameras.get(camera_id)
+            if old is not None and old.source == source:
+                return old
+            camera = VideoCamera(source, threaded=threaded)
+            self.cameras[camera_id] = camera
+        if old is not None:
+            # Stop the old grabber thread and close its capture
+            old.release()
+        return camera
+
+    def remove(self, camera_id):
+        with self.lock:
+            camera = self.cameras.pop(camera_id, None)
+        if camera is None:
+            return False
+        camera.release()
+        return True
+
+    def get(self, camera_id):
+        with self.lock:
+            return self.cameras.get(camera_id)
+
+    def items(self):
+        with self.lock:
+            return list(self.cameras.items())
+
+    def stats(self):
+        return {camera_id: {"source": str(camera.source), **camera.get_stats()}
+                for camera_id, camera in self.items()}
@@ -0,0 +1,128 @@
+"""
+Second-stage plate detection on rider crops.
+
+Plates in a wide frame are often only a few pixels high at the input size
+of the first pass. For every violating rider whose plate was not found, the
+rider region (with a small margin) is cut from the full-resolution frame,
+upsampled to crop_size and run through YOLO again, restricted to the
+plate class. All crops of a batch of frames share one
+YOLO call; the boxes are mapped back to frame coordinates and merged into
+the first-pass detections.
+"""
+
+import cv2
+import numpy as np
+
+from association import associate_violations, containment_matrix, iou_matrix
+from detections import Detections
+
+
+class PlateCascade:
+    def __init__(self, model, crop_size=320, pad=(0.1, 0.05, 0.1, 0.1), min_conf=0.25,
+                 merge_iou=0.5, max_crops=16):
+        """
+        pad: (left, top, right, bottom) margins as fractions of the rider box size
+        max_crops: crops per call; the largest riders go first
+        """
+        self.model = model
+        self.crop_size = crop_size
+        self.pad = pad
+        self.min_conf = min_conf
+        self.merge_iou = merge_iou
+        self.max_crops = max_crops
+        self.plate_cls = [k for k, v in model.names.items() if v == 'number plate']
+
+        self.calls = 0
+        self.crops = 0
+        self.plates_found = 0
+
+    def candidates(self, dets):
+        """Rider boxes of violations that have no plate yet."""
+        by_class = dets.by_class()
+        riders = by_class['rider'].xyxy
+        violations = associate_violations(by_class['without helmet'].xyxy, riders, by_class['number plate'].xyxy)
+        return riders[sorted({v.rider for v in violations if v.plate is None})]
+
+    def _crop(self, frame, box):
+        h, w = frame.shape[:2]
+        bw, bh = box[2] - box[0], box[3] - box[1]
+        x1 = int(max(0, box[0] - self.pad[0] * bw))
+        y1 = int(max(0, box[1] - self.pad[1] * bh))
+        x2 = int(min(w, box[2] + self.pad[2] * bw))
+        y2 = int(min(h, box[3] + self.pad[3] * bh))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        scale = self.crop_size / max(x2 - x1, y2 - y1)
+        crop = cv2.resize(frame[y1:y2, x1:x2], (max(1, round((x2 - x1) * scale)), max(1, round((y2 - y1) * scale))),
+                          interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+        return crop, (x1, y1), scale
+
+    def refine_batch(self, frames, detections):
+        """Returns the detections of each frame with cascade plates merged in."""
+        if not self.plate_cls:
+            return detections
+
+        jobs = []
+        for i, (frame, dets) in enumerate(zip(frames, detections)):
+            for box in self.candidates(dets):
+                jobs.append((i, box))
+        if not jobs:
+            return detections
+
+        jobs.sort(key=lambda job: -(job[1][2] - job[1][0]) * (job[1][3] - job[1][1]))
+        crops, origins = [], []
+        for i, box in jobs[:self.max_crops]:
+            cropped = self._crop(frames[i], box)
+            if cropped is not None:
+                crops.append(cropped[0])
+                origins.append((i, box, cropped[1], cropped[2]))
+        if not crops:
+            return detections
+
+        results = self.model(crops, imgsz=self.crop_size, classes=self.plate_cls, conf=self.min_conf, verbose=False)
+        self.calls += 1
+        self.crops += len(crops)
+
+        found = [[] for _ in frames]
+        for (i, rider, (x0, y0), scale), r in zip(origins, results):
+            plates = Detections.from_yolo([r], self.model.names)
+            if len(plates) == 0:
+                continue
+            # Back to full-frame pixels; keep the best plate the association step can pair with this rider
+            boxes = plates.xyxy / scale + np.array([x0, y0, x0, y0], dtype=np.float32)
+            inside = containment_matrix(boxes, rider[None])[:, 0]
+            if not inside.any():
+                continue
+            best = int(np.argmax(np.where(inside, plates.conf, -1.0)))
+            found[i].append((boxes[best], plates.conf[best], plates.cls[best]))
+
+        refined = []
+        for dets, new in zip(detections, found):
+            if new:
+                dets = self._merge(dets, new)
+            refined.append(dets)
+        return refined
+
+    def _merge(self, dets, new):
+        boxes = np.array([b for b, _, _ in new], dtype=np.float32)
+        conf = np.array([c for _, c, _ in new], dtype=np.float32)
+        cls = np.array([k for _, _, k in new], dtype=np.int64)
+
+        # Skip boxes that duplicate a first-pass plate
+        existing = dets.xyxy[dets.class_mask('number plate')]
+        if len(existing):
+            keep = iou_matrix(boxes, existing).max(axis=1) < self.merge_iou
+            boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+        if len(boxes) == 0:
+            return dets
+
+        self.plates_found += len(boxes)
+        return Detections(np.concatenate([dets.xyxy, boxes]), np.concatenate([dets.conf, conf]),
+                          np.concatenate([dets.cls, cls]), dets.names)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "crops": self.crops,
+            "plates_found": self.plates_found
+        }
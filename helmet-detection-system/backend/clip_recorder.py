@@ -0,0 +1,285 @@
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's SOF header, without decoding the image."""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _chunk(fourcc, payload):
+    pad = b'\0' if len(payload) % 2 else b''
+    return fourcc + struct.pack('<I', len(payload)) + payload + pad
+
+
+def _list(kind, payload):
+    return b'LIST' + struct.pack('<I', len(payload) + 4) + kind + payload
+
+
+def write_mjpeg_avi(path, jpegs, fps):
+    """
+    Write JPEG frames as an MJPEG AVI. The compressed frames are copied into
+    the container as is, so nothing is decoded or re-encoded.
+    """
+    width, height = jpeg_size(jpegs[0]) or (0, 0)
+    frames = len(jpegs)
+    rate = max(1, int(round(fps * 1000)))
+    biggest = max(len(j) for j in jpegs)
+
+    avih = struct.pack('<14I', int(round(1e6 / fps)), int(biggest * fps), 0, 0x10, frames, 0, 1,
+                       biggest, width, height, 0, 0, 0, 0)
+    strh = b'vidsMJPG' + struct.pack('<IHHIIIIIIIIhhhh', 0, 0, 0, 0, 1000, rate, 0, frames, biggest,
+                                     0xFFFFFFFF, 0, 0, 0, width, height)
+    strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG', width * height * 3, 0, 0, 0, 0)
+    hdrl = _list(b'hdrl', _chunk(b'avih', avih) + _list(b'strl', _chunk(b'strh', strh) + _chunk(b'strf', strf)))
+
+    index, offset = [], 4  # idx1 offsets count from the 'movi' fourcc
+    with open(path, 'wb') as f:
+        movi_size = 4 + sum(8 + len(j) + len(j) % 2 for j in jpegs)
+        idx_size = 8 + 16 * frames
+        f.write(b'RIFF' + struct.pack('<I', 4 + len(hdrl) + 8 + movi_size + idx_size) + b'AVI ')
+        f.write(hdrl)
+        f.write(b'LIST' + struct.pack('<I', movi_size) + b'movi')
+        for j in jpegs:
+            f.write(_chunk(b'00dc', j))
+            index.append(b'00dc' + struct.pack('<III', 0x10, offset, len(j)))
+            offset += 8 + len(j) + len(j) % 2
+        f.write(_chunk(b'idx1', b''.join(index)))
+
+
+class FrameRing:
+    """Recent (timestamp, jpeg) frames of one camera, capped by age."""
+
+    def __init__(self, max_seconds):
+        self.max_seconds = max_seconds
+        self.frames = deque()
+        self.bytes = 0
+
+    def add(self, ts, jpeg):
+        self.frames.append((ts, jpeg))
+        self.bytes += len(jpeg)
+        while self.frames and ts - self.frames[0][0] > self.max_seconds:
+            self.pop_oldest()
+
+    def pop_oldest(self):
+        self.bytes -= len(self.frames.popleft()[1])
+
+    def since(self, ts):
+        return [frame for frame in self.frames if frame[0] >= ts]
+
+
+class PendingClip:
+    def __init__(self, camera_id, path, frames, end):
+        self.camera_id = camera_id
+        self.path = path
+        self.frames = frames
+        self.bytes = sum(len(j) for _, j in frames)
+        self.end = end
+
+
+class ClipRecorder:
+    """
+    Short violation clips from the already-encoded stream JPEGs.
+
+    Violations are logged well after the rider was seen (multi-frame
+    fusion, track expiry, the OCR queue), so trigger() takes the sighting
+    time, and every camera keeps a ring of its last pre_seconds + max_lag
+    seconds of frames. trigger() copies the frames from pre_seconds before
+    the sighting out of that ring and keeps collecting until post_seconds
+    after the last sighting; the clip is then written as MJPEG-in-AVI by a
+    background thread. A violation inside a clip that is still collecting
+    extends that clip instead of starting a second, overlapping one.
+
+    max_bytes bounds all rings and collecting clips together. Over budget,
+    the oldest buffered frame of any camera goes first; a collecting clip is
+    only cut short once no ring frames are left.
+    """
+
+    def __init__(self, clips_dir, pre_seconds=5.0, post_seconds=5.0, max_bytes=64 * 1024 * 1024,
+                 max_lag=30.0, max_clip_seconds=60.0, url_prefix='/static/clips'):
+        self.clips_dir = clips_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self.max_lag = max_lag
+        self.max_clip_seconds = max_clip_seconds
+        self.url_prefix = url_prefix
+        os.makedirs(clips_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.rings = {}
+        self.pending = {}
+        self.written = 0
+        self.failed = 0
+        self.truncated = 0
+        # Ring and collecting-clip bytes; a frame held by both counts twice, so this over-estimates
+        self.buffered_bytes = 0
+
+        self.write_queue = queue.Queue()
+        REGISTRY.set_gauge('clip_buffer_bytes', lambda: self.buffered_bytes)
+        self.writer = threading.Thread(target=self._writer, daemon=True)
+        self.writer.start()
+
+    def add_frame(self, camera_id, jpeg, ts=None):
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            ring = self.rings.get(camera_id)
+            if ring is None:
+                ring = self.rings[camera_id] = FrameRing(self.pre_seconds + self.max_lag)
+            before = ring.bytes
+            ring.add(ts, jpeg)
+            self.buffered_bytes += ring.bytes - before
+
+            clip = self.pending.get(camera_id)
+            if clip is not None:
+                clip.frames.append((ts, jpeg))
+                clip.bytes += len(jpeg)
+                self.buffered_bytes += len(jpeg)
+                if ts >= clip.end:
+                    self._finish(camera_id)
+            self._enforce_budget()
+
+    def trigger(self, camera_id, ts=None, until=None):
+        """
+        Start (or extend) the clip around an event first seen at ts and last
+        seen at until (both default to now). Returns its URL, or None with
+        no frames buffered.
+        """
+        ts = time.time() if ts is None else ts
+        until = ts if until is None else max(ts, until)
+        with self.lock:
+            ring = self.rings.get(camera_id)
+            clip = self.pending.get(camera_id)
+            if clip is not None:
+                start = clip.frames[0][0] if clip.frames else ts
+                # An event seen before the clip started also gets its lead-in
+                earlier = [f for f in ring.since(ts - self.pre_seconds) if f[0] < start] if ring else []
+                if earlier:
+                    clip.frames[:0] = earlier
+                    added = sum(len(j) for _, j in earlier)
+                    clip.bytes += added
+                    self.buffered_bytes += added
+                    start = earlier[0][0]
+                clip.end = min(max(clip.end, until + self.post_seconds), start + self.max_clip_seconds)
+                return self._url(clip.path)
+
+            frames = ring.since(ts - self.pre_seconds) if ring is not None else []
+            if not frames:
+                return None
+            end = min(until + self.post_seconds, frames[0][0] + self.max_clip_seconds)
+            in_clip = [f for f in frames if f[0] <= end]
+            if not in_clip:
+                # The event is older than anything still buffered
+                return None
+            name = f"clip_{camera_id}_{int(ts)}_{int(ts * 1000) % 1000:03d}.avi"
+            clip = self.pending[camera_id] = PendingClip(camera_id, os.path.join(self.clips_dir, name),
+                                                         in_clip, end)
+            self.buffered_bytes += clip.bytes
+            if frames[-1][0] >= end:
+                # Logged after the event was over: the ring already holds the whole clip
+                self._finish(camera_id)
+            return self._url(clip.path)
+
+    def remove(self, camera_id):
+        """Forget a camera's buffer; a clip still collecting is written with what it has."""
+        with self.lock:
+            ring = self.rings.pop(camera_id, None)
+            if ring is not None:
+                self.buffered_bytes -= ring.bytes
+            if camera_id in self.pending:
+                self._finish(camera_id)
+
+    def _enforce_budget(self):
+        while self.buffered_bytes > self.max_bytes:
+            rings = [ring for ring in self.rings.values() if ring.frames]
+            if rings:
+                ring = min(rings, key=lambda r: r.frames[0][0])
+                before = ring.bytes
+                ring.pop_oldest()
+                self.buffered_bytes -= before - ring.bytes
+            elif self.pending:
+                # Only collecting clips are left: close the oldest early
+                camera_id = min(self.pending, key=lambda c: self.pending[c].frames[0][0])
+                self.truncated += 1
+                self._finish(camera_id)
+            else:
+                break
+
+    def flush(self):
+        """Write every collecting clip now and wait for the writer."""
+        with self.lock:
+            for camera_id in list(self.pending):
+                self._finish(camera_id)
+        self.write_queue.join()
+
+    def _url(self, path):
+        return f"{self.url_prefix}/{os.path.basename(path)}"
+
+    def _finish(self, camera_id):
+        clip = self.pending.pop(camera_id)
+        self.buffered_bytes -= clip.bytes
+        self.write_queue.put(clip)
+
+    def _writer(self):
+        while True:
+            try:
+                clip = self.write_queue.get(timeout=1.0)
+            except queue.Empty:
+                # A camera that stopped delivering frames never reaches its clip end in add_frame
+                now = time.time()
+                with self.lock:
+                    for camera_id in [c for c, clip in self.pending.items() if now > clip.end + 1.0]:
+                        self._finish(camera_id)
+                continue
+            try:
+                self._write(clip)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"[CLIP ERROR] {clip.path}: {e}")
+            finally:
+                self.write_queue.task_done()
+
+    def _write(self, clip):
+        jpegs = [j for _, j in clip.frames]
+        span = clip.frames[-1][0] - clip.frames[0][0]
+        fps = (len(jpegs) - 1) / span if len(jpegs) > 1 and span > 0 else 1.0
+        # Written under a temporary name so a listed clip is never half-written
+        tmp_path = clip.path + '.part'
+        write_mjpeg_avi(tmp_path, jpegs, fps)
+        os.replace(tmp_path, clip.path)
+        print(f"[CLIP] {os.path.basename(clip.path)}: {len(jpegs)} frames, {span:.1f}s")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "buffered_mb": round(self.buffered_bytes / 1e6, 1),
+                "budget_mb": round(self.max_bytes / 1e6, 1),
+                "collecting": len(self.pending),
+                "written": self.written,
+                "failed": self.failed,
+                "truncated": self.truncated,
+                "pre_seconds": self.pre_seconds,
+                "post_seconds": self.post_seconds
+            }
@@ -0,0 +1,65 @@
+import numpy as np
+
+CLASS_NAMES = ('with helmet', 'without helmet', 'rider', 'number plate')
+
+
+class Detections:
+    """
+    YOLO output for one frame as contiguous NumPy arrays.
+
+    xyxy: (N, 4) float32 boxes in pixel coordinates
+    conf: (N,) float32 scores
+    cls:  (N,) int64 class ids, mapped to labels through names
+    """
+
+    def __init__(self, xyxy=None, conf=None, cls=None, names=None):
+        self.xyxy = np.zeros((0, 4), dtype=np.float32) if xyxy is None else \
+            np.ascontiguousarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.zeros((0,), dtype=np.float32) if conf is None else \
+            np.ascontiguousarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.zeros((0,), dtype=np.int64) if cls is None else \
+            np.ascontiguousarray(cls, dtype=np.int64).reshape(-1)
+        self.names = names if names is not None else {}
+
+    @classmethod
+    def from_yolo(cls, results, names):
+        """Pull every box of an ultralytics result list with one tensor transfer per result."""
+        chunks = []
+        for r in results:
+            if r.boxes is None or len(r.boxes) == 0:
+                continue
+            # data columns: x1, y1, x2, y2, [track_id,] conf, cls
+            chunks.append(r.boxes.data.cpu().numpy())
+
+        if not chunks:
+            return cls(names=names)
+
+        data = chunks[0] if len(chunks) == 1 else np.concatenate(chunks, axis=0)
+        return cls(data[:, :4], data[:, -2], data[:, -1], names)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def label(self, i):
+        return self.names.get(int(self.cls[i]), str(int(self.cls[i])))
+
+    def class_mask(self, name):
+        ids = [k for k, v in self.names.items() if v == name]
+        return np.isin(self.cls, ids)
+
+    def subset(self, mask):
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names)
+
+    def by_class(self, class_names=CLASS_NAMES):
+        """Split into one Detections per label using boolean masks."""
+        return {name: self.subset(self.class_mask(name)) for name in class_names}
+
+    def centers(self):
+        return np.stack([(self.xyxy[:, 0] + self.xyxy[:, 2]) / 2,
+                         (self.xyxy[:, 1] + self.xyxy[:, 3]) / 2], axis=1)
+
+    def to_list(self):
+        """JSON-friendly view, one dict per box."""
+        return [{'label': self.label(i),
+                 'bbox': [float(v) for v in self.xyxy[i]],
+                 'conf': float(self.conf[i])} for i in range(len(self))]
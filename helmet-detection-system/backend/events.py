@@ -0,0 +1,59 @@
+import json
+import threading
+from collections import deque
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for Server-Sent Events.
+
+    Events go into a bounded history per event type and every waiting
+    subscriber is woken. Each subscriber keeps its own sequence cursor, so any
+    number of them can follow the same stream without per-subscriber queues.
+    Separate histories keep frequent events (stats) from pushing rare ones
+    (violations) out; a subscriber that fell behind further than a history
+    reaches is told which event types it missed.
+    """
+
+    def __init__(self, history=256, keep=None):
+        """keep: {event: history length} overrides, e.g. {'stats': 1} to keep only the latest."""
+        self.cond = threading.Condition()
+        self.history = history
+        self.keep = keep or {}
+        self.events = {}
+        self.evicted = {}
+        self.seq = 0
+
+    def publish(self, event, data, event_id=None):
+        with self.cond:
+            self.seq += 1
+            events = self.events.get(event)
+            if events is None:
+                events = self.events[event] = deque(maxlen=self.keep.get(event, self.history))
+            if len(events) == events.maxlen:
+                self.evicted[event] = events[0][0]
+            events.append((self.seq, event, data, event_id))
+            self.cond.notify_all()
+
+    def current_seq(self):
+        with self.cond:
+            return self.seq
+
+    def wait(self, last_seq, timeout=15.0):
+        """
+        Returns (events newer than last_seq in publish order, new cursor,
+        event types whose history no longer reaches back to last_seq);
+        empty on timeout.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > last_seq, timeout)
+            pending = sorted(e for events in self.events.values() for e in events if e[0] > last_seq)
+            missed = {event for event, seq in self.evicted.items() if seq > last_seq}
+            return pending, self.seq, missed
+
+
+def format_sse(event, data, event_id=None):
+    msg = f"event: {event}\n"
+    if event_id is not None:
+        msg += f"id: {event_id}\n"
+    return msg + f"data: {json.dumps(data)}\n\n"
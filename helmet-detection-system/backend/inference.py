@@ -0,0 +1,112 @@
+"""
+Pluggable YOLO inference backends.
+
+'torch' loads the .pt weights through ultralytics as before. 'onnx' and
+'openvino' export the weights once with the ultralytics exporter, cache the
+artefact keyed by the weights hash and export settings, and load it back
+through ultralytics.YOLO. Exported models return the same Results objects,
+so Detections.from_yolo and everything downstream is unchanged.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def weights_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def resolve_weights(weights):
+    """
+    Path of the weights on disk. Names like 'yolov8n.pt' that are not local
+    files are fetched by ultralytics first, as the torch backend would.
+    """
+    if os.path.isfile(weights):
+        return weights
+    from ultralytics import YOLO
+    return getattr(YOLO(weights), 'ckpt_path', None) or weights
+
+
+def _calibration_yaml(calib_dir, names, out_dir):
+    """Dataset yaml pointing the INT8 calibrator at a plain folder of images."""
+    path = os.path.join(out_dir, 'calibration.yaml')
+    calib_dir = os.path.abspath(calib_dir)
+    with open(path, 'w') as f:
+        # JSON is valid YAML and keeps label names with spaces quoted
+        json.dump({"path": calib_dir, "train": calib_dir, "val": calib_dir,
+                   "nc": len(names), "names": [names[i] for i in sorted(names)]}, f)
+    return path
+
+
+def export_model(weights, backend, imgsz=640, int8=False, calib_dir=None, cache_dir=None):
+    """
+    Export weights to backend once and return the cached artefact path.
+    The cache key covers the weights content and every export setting, so
+    retrained weights or a different imgsz produce a fresh export.
+    """
+    if backend not in ('onnx', 'openvino'):
+        raise ValueError(f"Nothing to export for backend: {backend}")
+    if int8 and backend != 'openvino':
+        raise ValueError("INT8 quantisation is only available with the openvino backend")
+    if int8 and not calib_dir:
+        raise ValueError("INT8 quantisation needs a calibration image folder")
+
+    weights = resolve_weights(weights)
+    settings = {"backend": backend, "imgsz": imgsz, "int8": bool(int8),
+                "calib": os.path.abspath(calib_dir) if int8 else None}
+    key = weights_hash(weights)[:16] + '-' + hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:8]
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(weights)), 'exported')
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, 'meta.json')
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            artefact = json.load(f)["artefact"]
+        if os.path.exists(artefact):
+            print(f"[INFO] Using cached {backend} export: {artefact}")
+            return artefact
+
+    print(f"[INFO] Exporting {weights} to {backend} (imgsz={imgsz}, int8={bool(int8)})...")
+    os.makedirs(entry_dir, exist_ok=True)
+    from ultralytics import YOLO
+    # The exporter writes next to the weights, so export from a copy inside the cache entry
+    local_weights = os.path.join(entry_dir, os.path.basename(weights))
+    shutil.copy2(weights, local_weights)
+    model = YOLO(local_weights)
+
+    kwargs = {"format": backend, "imgsz": imgsz, "dynamic": True}
+    with tempfile.TemporaryDirectory() as tmp:
+        if int8:
+            kwargs.update(int8=True, data=_calibration_yaml(calib_dir, model.names, tmp))
+        artefact = model.export(**kwargs)
+
+    with open(meta_path, 'w') as f:
+        json.dump({"artefact": os.path.abspath(artefact), "weights": os.path.abspath(weights), **settings}, f, indent=2)
+    os.remove(local_weights)
+    print(f"[INFO] Export cached at {artefact}")
+    return artefact
+
+
+def load_yolo(weights, backend='torch', device='cpu', imgsz=640, int8=False, calib_dir=None, cache_dir=None):
+    """Returns a ultralytics.YOLO model for the chosen backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    # Imported here so modules using inference need ultralytics only to load a model
+    from ultralytics import YOLO
+    if backend == 'torch':
+        model = YOLO(weights)
+        # Move to device explicitly if needed, usually ultralytics handles it but being explicit helps debug
+        model.to(device)
+        return model
+
+    artefact = export_model(weights, backend, imgsz=imgsz, int8=int8, calib_dir=calib_dir, cache_dir=cache_dir)
+    return YOLO(artefact, task='detect')
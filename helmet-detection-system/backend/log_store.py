@@ -0,0 +1,208 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY
+
+
+class LogStore:
+    """
+    Violation log backed by SQLite in WAL mode.
+
+    append() only enqueues; a single writer thread commits queued records in
+    batches, one transaction per batch, so every record is written atomically
+    and appends never block the OCR threads. The full record is kept as JSON
+    next to indexed timestamp / plate columns.
+    """
+
+    def __init__(self, db_path, legacy_json=None, batch_size=100, flush_interval=0.25):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.conn = self._connect()
+        self._init_db()
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+        self.pending = queue.Queue()
+        REGISTRY.set_gauge('log_pending', self.pending.qsize)
+        self.writer = threading.Thread(target=self._writer, name="log-writer", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS violations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    plate_text TEXT,
+                    confidence REAL,
+                    type TEXT,
+                    camera_id TEXT,
+                    data TEXT NOT NULL
+                )""")
+            # Databases created before multi-camera support lack the column
+            columns = [row['name'] for row in self.conn.execute("PRAGMA table_info(violations)")]
+            if 'camera_id' not in columns:
+                self.conn.execute("ALTER TABLE violations ADD COLUMN camera_id TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_timestamp ON violations(timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_camera ON violations(camera_id, id)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS migrations (
+                    source TEXT PRIMARY KEY,
+                    migrated_at TEXT NOT NULL,
+                    records INTEGER NOT NULL
+                )""")
+
+    def _migrate_json(self, json_path):
+        """
+        One-time import of the old read-modify-write detections.json. The file
+        is left in place; the import is recorded in the database so it runs once.
+        """
+        # Earlier versions renamed the file to .migrated after importing it
+        if not os.path.exists(json_path) or os.path.exists(json_path + '.migrated'):
+            return
+        source = os.path.basename(json_path)
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+                return
+        try:
+            with open(json_path, 'r') as f:
+                records = json.load(f)
+        except Exception as e:
+            print(f"[LOG MIGRATION ERROR] {e}")
+            return
+
+        # Records and the marker commit together, so a crash cannot import twice
+        with self.lock, self.conn:
+            self._insert_rows(records or [])
+            self.conn.execute("INSERT INTO migrations (source, migrated_at, records) VALUES (?, ?, ?)",
+                              (source, time.strftime('%Y-%m-%dT%H:%M:%S'), len(records or [])))
+        print(f"[INFO] Migrated {len(records or [])} log entries from {json_path}")
+
+    def _insert_rows(self, records):
+        """INSERT each record inside the caller's transaction; returns copies with their ids."""
+        stored = []
+        for r in records:
+            cur = self.conn.execute(
+                "INSERT INTO violations (timestamp, plate_text, confidence, type, camera_id, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (r.get('timestamp', ''), r.get('plate_text'), r.get('confidence'), r.get('type'),
+                 r.get('camera_id'), json.dumps(r)))
+            stored.append(dict(r, id=cur.lastrowid))
+        return stored
+
+    def _insert(self, records):
+        """Insert in one transaction; returns copies of the records with their ids."""
+        start = time.perf_counter()
+        with self.lock, self.conn:
+            stored = self._insert_rows(records)
+        REGISTRY.observe('log_write', time.perf_counter() - start)
+        REGISTRY.inc('log_records', len(stored))
+        return stored
+
+    def add_listener(self, fn):
+        """fn(record) is called from the writer thread for every committed record."""
+        self.listeners.append(fn)
+
+    def append(self, record):
+        self.pending.put(record)
+
+    def append_many(self, records):
+        for record in records:
+            self.pending.put(record)
+
+    def flush(self):
+        """Block until every queued record is committed."""
+        self.pending.join()
+
+    def _writer(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.time() + self.flush_interval
+            try:
+                # Gather whatever else arrives shortly so bursts share one commit
+                while len(batch) < self.batch_size:
+                    batch.append(self.pending.get(timeout=max(0.0, deadline - time.time())))
+            except queue.Empty:
+                pass
+
+            try:
+                stored = self._insert(batch)
+            except Exception as e:
+                print(f"[LOG ERROR] {e}")
+                stored = []
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+            for record in stored:
+                for fn in self.listeners:
+                    try:
+                        fn(record)
+                    except Exception as e:
+                        print(f"[LOG LISTENER ERROR] {e}")
+
+    def _row_to_record(self, row):
+        record = json.loads(row['data'])
+        record['id'] = row['id']
+        return record
+
+    def last_id(self):
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(id) FROM violations").fetchone()
+        return row[0] or 0
+
+    def query(self, since_id=None, before_id=None, start=None, end=None, plate=None,
+              camera_id=None, limit=None, newest_first=False):
+        """
+        Filtered read.
+          since_id / before_id: only records with id above / below the cursor
+          start / end: ISO timestamp range (inclusive)
+          plate: case-insensitive substring of plate_text
+          camera_id: only records from that camera
+        """
+        clauses, params = [], []
+        if since_id is not None:
+            clauses.append("id > ?")
+            params.append(since_id)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if plate:
+            clauses.append("plate_text LIKE ?")
+            params.append(f"%{plate}%")
+        if camera_id:
+            clauses.append("camera_id = ?")
+            params.append(camera_id)
+
+        sql = "SELECT id, data FROM violations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._row_to_record(row) for row in rows]
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """Latency samples of one stage: quantiles over the last window samples, count / sum over all."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self):
+        ranked = sorted(self.samples)
+        if not ranked:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ranked[min(len(ranked) - 1, int(q * len(ranked)))] for q in QUANTILES}
+
+
+class Metrics:
+    """
+    Process-wide performance counters:
+      stages   - rolling latency histograms (capture, yolo, association, annotate,
+                 encode, ocr_wait, ocr, log_write, ...), exported as summaries
+      counters - monotonically increasing totals (frames, detections, ocr_calls, ...)
+      gauges   - current values; either set, or a callable read at export time
+    Exported as Prometheus text (prometheus()) or a JSON-friendly dict (snapshot()).
+    """
+
+    def __init__(self, window=1024, prefix='helmet'):
+        self.window = window
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = RollingHistogram(self.window)
+            hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """value: a number, or a callable returning one when metrics are exported."""
+        with self.lock:
+            self.gauges[name] = value
+
+    def _gauge_values(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+        values = {}
+        for name, value in gauges.items():
+            try:
+                values[name] = float(value() if callable(value) else value)
+            except Exception:
+                continue
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            stages = {stage: (hist.count, hist.total, hist.quantiles()) for stage, hist in self.stages.items()}
+            counters = dict(self.counters)
+        return {
+            "stages": {
+                stage: {"count": count,
+                        "avg_ms": round(1000 * total / count, 2) if count else 0.0,
+                        **{f"p{int(q * 100)}_ms": round(1000 * v, 2) for q, v in quantiles.items()}}
+                for stage, (count, total, quantiles) in sorted(stages.items())
+            },
+            "counters": counters,
+            "gauges": self._gauge_values()
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            stages = {stage: (hist.count, hist.total, hist.quantiles()) for stage, hist in self.stages.items()}
+            counters = dict(self.counters)
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Per-stage latency (quantiles over the last {self.window} samples)",
+                 f"# TYPE {p}_stage_seconds summary"]
+        for stage, (count, total, quantiles) in sorted(stages.items()):
+            for q, v in quantiles.items():
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q}"}} {v:.6f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {count}')
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        for name, value in sorted(self._gauge_values().items()):
+            lines += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every component in the process, like the default registry of a Prometheus client
+REGISTRY = Metrics()
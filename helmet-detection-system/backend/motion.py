@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap activity check run before YOLO.
+
+    Each frame is downscaled to grayscale and compared with a running-average
+    background. Inference is skipped while the changed area inside the ROIs
+    stays below min_changed; any change wakes it on the very same frame. A
+    short hold keeps inference running after activity, and keepalive forces a
+    refresh every so often even on a static scene.
+
+    rois: list of (x1, y1, x2, y2) in normalised [0, 1] coordinates, or None
+          for the whole frame.
+    """
+
+    def __init__(self, rois=None, width=160, pixel_thresh=25, min_changed=0.002,
+                 alpha=0.05, hold_frames=5, keepalive=50):
+        self.rois = rois
+        self.width = width
+        self.pixel_thresh = pixel_thresh
+        self.min_changed = min_changed
+        self.alpha = alpha
+        self.hold_frames = hold_frames
+        self.keepalive = keepalive
+
+        self.background = None
+        self.roi_mask = None
+        self.hold = 0
+        self.since_inference = 0
+        self.last_changed = 0.0
+
+        self.frames = 0
+        self.skipped = 0
+
+    def _build_mask(self, shape):
+        if not self.rois:
+            return None
+        h, w = shape
+        mask = np.zeros(shape, dtype=bool)
+        for x1, y1, x2, y2 in self.rois:
+            mask[int(y1 * h):int(np.ceil(y2 * h)), int(x1 * w):int(np.ceil(x2 * w))] = True
+        return mask
+
+    def is_active(self, frame):
+        """True if YOLO should run on this frame."""
+        self.frames += 1
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.roi_mask = self._build_mask(gray.shape)
+            return self._run()
+
+        moving = cv2.absdiff(gray, cv2.convertScaleAbs(self.background)) > self.pixel_thresh
+        if self.roi_mask is not None:
+            moving = moving[self.roi_mask]
+        self.last_changed = float(moving.mean()) if moving.size else 0.0
+        cv2.accumulateWeighted(gray, self.background, self.alpha)
+
+        if self.last_changed >= self.min_changed:
+            self.hold = self.hold_frames
+            return self._run()
+        if self.hold > 0:
+            self.hold -= 1
+            return self._run()
+        if self.since_inference >= self.keepalive:
+            return self._run()
+
+        self.since_inference += 1
+        self.skipped += 1
+        return False
+
+    def _run(self):
+        self.since_inference = 0
+        return True
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            "changed": round(self.last_changed, 4)
+        }
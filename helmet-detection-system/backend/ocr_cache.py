@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(img, hash_size=16, margin=4):
+    """
+    Difference hash of a crop: grayscale, shrink to (hash_size + 1) x hash_size
+    and set a bit where a pixel is brighter than its left neighbour by more
+    than margin. The margin keeps flat background stable under JPEG noise, so
+    re-encoded copies of a crop usually hash the same; a different plate does not.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] - small[:, :-1] > margin).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+class OCRCache:
+    """
+    OCR results keyed by crop hash + OCR settings.
+
+    An in-memory LRU (capacity entries) sits in front of an optional SQLite
+    tier at disk_path that survives restarts and reruns. Only misses reach
+    the OCR model; hits and misses are counted for stats().
+    """
+
+    def __init__(self, capacity=2048, disk_path=None, settings='', min_edges=16):
+        """min_edges: crops whose hash has fewer set bits are too flat to key safely and bypass the cache"""
+        self.capacity = capacity
+        self.min_edges = min_edges
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self.conn = sqlite3.connect(disk_path, timeout=10, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS ocr_cache (key TEXT PRIMARY KEY, text TEXT, conf REAL)")
+
+    def key(self, img, variant=''):
+        h, w = img.shape[:2]
+        digest = dhash(img)
+        if bin(int(digest, 16)).count('1') < self.min_edges:
+            return None
+        # Aspect bucket keeps differently shaped crops with similar gradients apart
+        return f"{self.settings}|{variant}|{round(4 * w / max(h, 1))}|{digest}"
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            if self.conn is not None:
+                row = self.conn.execute("SELECT text, conf FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self._remember(key, (row[0], row[1]))
+                    return (row[0], row[1])
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("INSERT OR REPLACE INTO ocr_cache (key, text, conf) VALUES (?, ?, ?)",
+                                      (key, value[0], float(value[1])))
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def recognize(self, img, fn, variant=''):
+        """fn(img) -> (text, conf), called only on a miss."""
+        return self.recognize_batch([img], lambda imgs: [fn(imgs[0])], variant)[0]
+
+    def recognize_batch(self, imgs, batch_fn, variant=''):
+        """batch_fn(imgs) -> [(text, conf)], called once with only the missed crops."""
+        keys = [None if img is None or img.size < 4 else self.key(img, variant) for img in imgs]
+        reads = [None] * len(imgs)
+        missed = {}
+        for i, k in enumerate(keys):
+            if k is None:
+                missed[('uncacheable', i)] = i
+            elif k not in missed:
+                reads[i] = self.get(k)
+                if reads[i] is None:
+                    missed[k] = i
+
+        # Identical crops within one batch are recognised once
+        if missed:
+            fresh = dict(zip(missed, batch_fn([imgs[i] for i in missed.values()])))
+            for k, read in fresh.items():
+                if isinstance(k, str):
+                    self.put(k, read)
+            for i, k in enumerate(keys):
+                if reads[i] is None:
+                    reads[i] = fresh[k if k is not None else ('uncacheable', i)]
+        return reads
+
+    def clear(self):
+        """Forget the in-memory entries and counters; the disk tier is kept."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "capacity": self.capacity,
+                "disk": self.conn is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
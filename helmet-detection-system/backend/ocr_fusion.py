@@ -0,0 +1,63 @@
+import re
+from collections import defaultdict
+
+
+def normalize_plate_text(text):
+    """Uppercase and strip everything except letters and digits."""
+    return re.sub(r'[^A-Z0-9]', '', (text or '').upper())
+
+
+class PlateVoter:
+    """
+    Fuses several OCR reads of the same plate.
+
+    The string length is voted first; reads of the winning length then vote
+    per character position, each weighted by its OCR confidence. The fused
+    read becomes final once enough reads agree at every position.
+    """
+
+    def __init__(self, min_reads=2, agreement=0.6, instant_conf=0.9):
+        self.min_reads = min_reads
+        self.agreement = agreement
+        self.instant_conf = instant_conf
+        self.reads = []
+
+    def add(self, text, conf):
+        text = normalize_plate_text(text)
+        if text and conf > 0:
+            self.reads.append((text, float(conf)))
+
+    def fuse(self):
+        """Returns (text, conf, agreement); empty text when there are no reads."""
+        if not self.reads:
+            return "", 0.0, 0.0
+
+        total = sum(conf for _, conf in self.reads)
+        by_length = defaultdict(float)
+        for text, conf in self.reads:
+            by_length[len(text)] += conf
+        length = max(by_length, key=by_length.get)
+
+        chars, support, agreement = [], [], 1.0
+        for pos in range(length):
+            votes = defaultdict(float)
+            for text, conf in self.reads:
+                if len(text) == length:
+                    votes[text[pos]] += conf
+            char = max(votes, key=votes.get)
+            chars.append(char)
+            support.append(votes[char])
+            # Reads of another length count against every position
+            agreement = min(agreement, votes[char] / total)
+
+        conf = sum(support) / (len(support) * len(self.reads))
+        return "".join(chars), conf, agreement
+
+    def is_final(self):
+        if not self.reads:
+            return False
+        if len(self.reads) < self.min_reads:
+            # A single very confident read does not need corroboration
+            return max(conf for _, conf in self.reads) >= self.instant_conf
+        _, _, agreement = self.fuse()
+        return agreement >= self.agreement
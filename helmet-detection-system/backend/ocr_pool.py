@@ -0,0 +1,89 @@
+"""
+Process-pool OCR backend.
+
+Each worker process loads its own PaddleOCR once and runs preprocessing and
+recognition outside the Flask process, so OCR no longer competes with YOLO for
+the GIL. Crops travel through multiprocessing.shared_memory; only the block
+name, shape and dtype are pickled.
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import plate_ocr
+
+# Per-process PaddleOCR instance, created by _init_worker
+_ocr_model = None
+
+
+def _init_worker(lang):
+    global _ocr_model
+    from paddleocr import PaddleOCR
+    _ocr_model = PaddleOCR(use_angle_cls=True, lang=lang)
+
+
+def _ocr_batch_task(name, layout, preprocess):
+    # Workers share the parent's resource tracker, which unlinks the block
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        plate_imgs = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+                      for offset, shape, dtype in layout]
+    finally:
+        shm.close()
+    if preprocess:
+        plate_imgs = [plate_ocr.preprocess_plate_image(img) for img in plate_imgs]
+    return plate_ocr.perform_ocr_batch(_ocr_model, plate_imgs)
+
+
+class ProcessOCRPool:
+    def __init__(self, workers=2, lang='en'):
+        self.workers = workers
+        print(f"[INFO] Starting {workers} OCR worker processes...")
+        # spawn: a forked child would inherit CUDA/torch state from the parent
+        ctx = mp.get_context('spawn')
+        self.pool = ctx.Pool(processes=workers, initializer=_init_worker, initargs=(lang,))
+
+    def recognize_batch(self, plate_imgs, preprocess=False):
+        """
+        Blocking OCR of several crops. The batch is split into one chunk per
+        worker so every process is busy. Returns [(text, conf)].
+        """
+        results = [("", 0.0)] * len(plate_imgs)
+        valid = [i for i, img in enumerate(plate_imgs) if img is not None and img.size > 0]
+        if not valid:
+            return results
+
+        # Pack every crop into one shared block
+        layout, offset = [], 0
+        crops = [np.ascontiguousarray(plate_imgs[i]) for i in valid]
+        for img in crops:
+            layout.append((offset, img.shape, img.dtype.str))
+            offset += img.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=offset)
+        chunks = []
+        try:
+            for (start, shape, dtype), img in zip(layout, crops):
+                np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[:] = img
+            # Contiguous chunks of the shared block, one task each
+            size = -(-len(valid) // self.workers)
+            for i in range(0, len(valid), size):
+                chunks.append((valid[i:i + size], self.pool.apply_async(
+                    _ocr_batch_task, (shm.name, layout[i:i + size], preprocess))))
+            for indices, task in chunks:
+                for i, read in zip(indices, task.get()):
+                    results[i] = read
+        except Exception as e:
+            print(f"[OCR POOL ERROR] {e}")
+        finally:
+            # No worker may still be reading the block when it is unlinked
+            for _, task in chunks:
+                task.wait()
+            shm.close()
+            shm.unlink()
+        return results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,148 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+
+class OCRJob:
+    __slots__ = ('fn', 'args', 'priority', 'seq', 'enqueued_at', 'on_drop', 'batch_fn')
+
+    def __init__(self, fn, args, priority, seq, on_drop, batch_fn):
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.time()
+        self.on_drop = on_drop
+        self.batch_fn = batch_fn
+
+
+class OCRScheduler:
+    """
+    Bounded priority queue in front of the OCR workers.
+
+    Jobs with the highest priority (e.g. the largest / sharpest crop) run first.
+    When the queue is full a job is evicted according to drop_policy:
+      - 'lowest': drop the lowest-priority job, or reject the new one if it
+        ranks below everything already queued
+      - 'oldest': drop the job that has waited longest
+      - 'block': nothing is dropped; submit() waits for a free slot
+        (backpressure for offline callers that have no deadline)
+    Evicted jobs get their on_drop callback so callers can release state.
+
+    With batch_size > 1, queued jobs that share a batch_fn are taken together
+    and run as batch_fn([args, ...]) so the OCR model sees one batch.
+    """
+
+    def __init__(self, capacity=16, workers=1, drop_policy='lowest', batch_size=1):
+        if drop_policy not in ('lowest', 'oldest', 'block'):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.capacity = capacity
+        self.drop_policy = drop_policy
+        self.batch_size = batch_size
+        self.cond = threading.Condition()
+        self.jobs = []
+        self.seq = itertools.count()
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.running = 0
+        self.waits = deque(maxlen=500)
+
+        self.workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._worker, name=f"ocr-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, fn, *args, priority=0.0, on_drop=None, batch_fn=None, block=None):
+        """
+        Queue fn(*args). Returns False if the job was rejected outright.
+        block: wait for room instead of dropping; defaults to drop_policy == 'block'.
+        """
+        if block is None:
+            block = self.drop_policy == 'block'
+        job = OCRJob(fn, args, priority, next(self.seq), on_drop, batch_fn)
+        victim = None
+        with self.cond:
+            self.submitted += 1
+            if block:
+                self.cond.wait_for(lambda: len(self.jobs) < self.capacity)
+            elif len(self.jobs) >= self.capacity:
+                if self.drop_policy == 'oldest':
+                    victim = min(self.jobs, key=lambda j: j.seq)
+                else:
+                    victim = min(self.jobs, key=lambda j: (j.priority, -j.seq))
+                    if victim.priority > priority:
+                        victim = job
+                if victim is not job:
+                    self.jobs.remove(victim)
+                self.dropped += 1
+                REGISTRY.inc('ocr_drops')
+
+            if victim is not job:
+                self.jobs.append(job)
+                self.cond.notify_all()
+
+        if victim is not None and victim.on_drop is not None:
+            try:
+                victim.on_drop()
+            except Exception as e:
+                print(f"[OCR QUEUE ERROR] {e}")
+        return victim is not job
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.jobs)
+                ranked = sorted(self.jobs, key=lambda j: (j.priority, -j.seq), reverse=True)
+                job = ranked[0]
+                batch = [job]
+                if job.batch_fn is not None and self.batch_size > 1:
+                    batch += [j for j in ranked[1:] if j.batch_fn == job.batch_fn][:self.batch_size - 1]
+                now = time.time()
+                for j in batch:
+                    self.jobs.remove(j)
+                    self.waits.append(now - j.enqueued_at)
+                    REGISTRY.observe('ocr_wait', now - j.enqueued_at)
+                self.running += 1
+                # Slots just opened for blocked submitters
+                self.cond.notify_all()
+
+            try:
+                if len(batch) > 1:
+                    job.batch_fn([j.args for j in batch])
+                else:
+                    job.fn(*job.args)
+            except Exception as e:
+                print(f"[OCR QUEUE ERROR] {e}")
+
+            with self.cond:
+                self.running -= 1
+                self.completed += len(batch)
+                self.cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every queued job has finished."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.jobs and self.running == 0, timeout)
+
+    def stats(self):
+        with self.cond:
+            waits = sorted(self.waits)
+            now = time.time()
+            oldest = max((now - j.enqueued_at for j in self.jobs), default=0.0)
+            return {
+                "depth": len(self.jobs),
+                "capacity": self.capacity,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "wait_avg_ms": 1000 * sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95_ms": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "oldest_wait_ms": 1000 * oldest,
+            }
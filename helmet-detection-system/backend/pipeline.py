@@ -0,0 +1,163 @@
+import cv2
+import threading
+import time
+
+
+class FrameBroadcaster:
+    """Latest-frame mailbox shared by every viewer of one stream."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.subscribers = 0
+
+    def publish(self, frame_bytes):
+        with self.condition:
+            self.frame = frame_bytes
+            self.seq += 1
+            self.condition.notify_all()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Block until a frame newer than last_seq is published.
+        Returns (seq, frame), or (last_seq, None) on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq != last_seq, timeout):
+                return last_seq, None
+            return self.seq, self.frame
+
+    def add_subscriber(self):
+        with self.condition:
+            self.subscribers += 1
+            self.condition.notify_all()
+
+    def remove_subscriber(self):
+        with self.condition:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    def wait_for_subscribers(self, timeout=1.0):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.subscribers > 0, timeout)
+
+
+class StreamPipeline:
+    """
+    One capture -> detect -> encode loop for every registered camera.
+    Each pass takes the newest unseen frame of every camera and runs YOLO on
+    them as one batch; each annotated JPEG goes to that camera's
+    broadcaster, so YOLO runs once per frame regardless of how many
+    /video_feed clients are connected. With a ClipRecorder the same JPEGs
+    also feed its per-camera ring buffer.
+
+    Cameras are monitored (detected, logged, clipped) whether or not anyone
+    watches their feed; watched_only=True skips cameras without a viewer to
+    save compute.
+    """
+
+    def __init__(self, cameras, detector, max_batch=8, recorder=None, watched_only=False):
+        self.cameras = cameras
+        self.detector = detector
+        self.max_batch = max_batch
+        self.recorder = recorder
+        self.watched_only = watched_only
+        if recorder is not None:
+            detector.clip_recorder = recorder
+        self.broadcasters = {}
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+        self.batches = 0
+        self.frames_processed = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    def broadcaster(self, camera_id):
+        with self.lock:
+            if camera_id not in self.broadcasters:
+                self.broadcasters[camera_id] = FrameBroadcaster()
+            return self.broadcasters[camera_id]
+
+    def _collect(self):
+        """Newest unseen frame of every camera (with watched_only, of every camera with a viewer)."""
+        batch, active = [], 0
+        for camera_id, camera in self.cameras.items():
+            if self.watched_only and self.broadcaster(camera_id).subscribers == 0:
+                continue
+            active += 1
+            frame = camera.get_frame(timeout=0)
+            if frame is not None:
+                batch.append((camera_id, frame))
+        return batch, active
+
+    def _run(self):
+        print("[INFO] Stream pipeline started")
+        while self.running:
+            batch, active = self._collect()
+            if not batch:
+                # Idle while there is nothing to monitor instead of spinning;
+                # otherwise poll again shortly for the next decoded frame
+                self.wakeup.wait(timeout=0.01 if active else 1.0)
+                self.wakeup.clear()
+                continue
+
+            for i in range(0, len(batch), self.max_batch):
+                chunk = batch[i:i + self.max_batch]
+                camera_ids = [camera_id for camera_id, _ in chunk]
+                try:
+                    annotated = self.detector.detect_batch([frame for _, frame in chunk], camera_ids)
+                except Exception as e:
+                    print(f"[PIPELINE ERROR] {e}")
+                    continue
+                self.batches += 1
+                self.frames_processed += len(chunk)
+
+                start = time.time()
+                for camera_id, annotated_frame in zip(camera_ids, annotated):
+                    ret, buffer = cv2.imencode('.jpg', annotated_frame)
+                    if ret:
+                        jpeg = buffer.tobytes()
+                        self.broadcaster(camera_id).publish(jpeg)
+                        if self.recorder is not None:
+                            self.recorder.add_frame(camera_id, jpeg)
+                self.detector.record_stage('encode', time.time() - start)
+        print("[INFO] Stream pipeline stopped")
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames_processed,
+            "avg_batch": round(self.frames_processed / self.batches, 2) if self.batches else 0.0
+        }
+
+    def frames(self, camera_id='default'):
+        """MJPEG multipart generator for a single HTTP client."""
+        self.start()
+        broadcaster = self.broadcaster(camera_id)
+        broadcaster.add_subscriber()
+        self.wakeup.set()
+        seq = 0
+        try:
+            while True:
+                seq, frame = broadcaster.wait_for_frame(seq, timeout=1.0)
+                if frame is None:
+                    continue
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        finally:
+            broadcaster.remove_subscriber()
@@ -0,0 +1,165 @@
+import re
+import threading
+
+from ocr_fusion import normalize_plate_text
+
+LETTERS = 'letters'
+DIGITS = 'digits'
+
+# OCR confusions, read in the direction the plate position requires
+AS_DIGIT = {'O': '0', 'D': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'S': '5', 'G': '6', 'T': '7', 'B': '8'}
+AS_LETTER = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+
+# Region codes (kode wilayah) in use on Indonesian plates
+ID_REGIONS = {
+    'A', 'B', 'D', 'E', 'F', 'G', 'H', 'K', 'L', 'M', 'N', 'P', 'R', 'S', 'T', 'W', 'Z',
+    'AA', 'AB', 'AD', 'AE', 'AG', 'BA', 'BB', 'BD', 'BE', 'BG', 'BH', 'BK', 'BL', 'BM', 'BN', 'BP',
+    'DA', 'DB', 'DC', 'DD', 'DE', 'DG', 'DH', 'DK', 'DL', 'DM', 'DN', 'DR', 'DS', 'DT',
+    'EA', 'EB', 'ED', 'KB', 'KH', 'KT', 'KU', 'PA', 'PB'
+}
+
+
+class PlateFormat:
+    """
+    A plate grammar: a sequence of (kind, min_len, max_len) segments, each
+    all letters or all digits, with an optional whitelist for the first one.
+
+    parse() tries every way to split a read into the segments and keeps the
+    split needing the fewest confusable-character fixes (O->0 in a digit
+    position, 8->B in a letter position, ...). Spaces in the read are token
+    boundaries no segment may cross; only when no split respects them is the
+    read split freely, and then only without fixes (a stray space in
+    "B 12 34 XY"). Reads no split can explain within max_fixes are
+    impossible for this format.
+    """
+
+    def __init__(self, name, segments, prefixes=None, strip=None, max_fixes=2):
+        self.name = name
+        self.segments = segments
+        self.prefixes = prefixes
+        self.strip = re.compile(strip) if strip else None
+        self.max_fixes = max_fixes
+
+    def parse(self, text):
+        """Returns (corrected text with segments space-separated, fixes), or None."""
+        text = (text or '').upper()
+        if self.strip is not None:
+            text = self.strip.sub(' ', text)
+        tokens = [t for t in (normalize_plate_text(t) for t in text.split()) if t]
+        chars = "".join(tokens)
+        if not chars:
+            return None
+
+        # Positions in chars where the OCR put a space
+        breaks, pos = set(), 0
+        for token in tokens[:-1]:
+            pos += len(token)
+            breaks.add(pos)
+
+        best = self._split(chars, 0, 0, breaks)
+        if best is None and breaks:
+            best = self._split(chars, 0, 0, frozenset())
+            if best is not None and best[1] > 0:
+                best = None
+        if best is None or best[1] > self.max_fixes:
+            return None
+        return " ".join(best[0]), best[1]
+
+    def _split(self, chars, pos, seg, breaks):
+        """Cheapest (parts, fixes) for chars[pos:] against segments[seg:], no segment crossing a break."""
+        if seg == len(self.segments):
+            return ([], 0) if pos == len(chars) else None
+        kind, lo, hi = self.segments[seg]
+        best = None
+        for length in range(lo, min(hi, len(chars) - pos) + 1):
+            if any(pos < b < pos + length for b in breaks):
+                break
+            part, fixes = self._coerce(chars[pos:pos + length], kind)
+            if part is None or (seg == 0 and self.prefixes is not None and part not in self.prefixes):
+                continue
+            rest = self._split(chars, pos + length, seg + 1, breaks)
+            if rest is None:
+                continue
+            parts = ([part] if part else []) + rest[0]
+            if best is None or fixes + rest[1] < best[1]:
+                best = (parts, fixes + rest[1])
+        return best
+
+    @staticmethod
+    def _coerce(part, kind):
+        out, fixes = [], 0
+        for ch in part:
+            if (kind == DIGITS) == ch.isdigit():
+                out.append(ch)
+                continue
+            fixed = (AS_DIGIT if kind == DIGITS else AS_LETTER).get(ch)
+            if fixed is None:
+                return None, 0
+            out.append(fixed)
+            fixes += 1
+        return "".join(out), fixes
+
+
+FORMATS = {}
+
+
+def register_format(plate_format):
+    """Make a PlateFormat selectable by name (PLATE_FORMATS / PlateValidator)."""
+    FORMATS[plate_format.name] = plate_format
+    return plate_format
+
+
+# Indonesian: region 1-2 letters, 1-4 digits, 0-3 letter suffix ("B 1234 XYZ").
+# The expiry line under the number ("03.27") is read too and is stripped first.
+register_format(PlateFormat('id', [(LETTERS, 1, 2), (DIGITS, 1, 4), (LETTERS, 0, 3)],
+                            prefixes=ID_REGIONS, strip=r'\b\d{2}\s*[.\-/:]\s*\d{2}\b'))
+
+
+class PlateValidator:
+    """
+    Checks OCR reads against one or more registered formats before they are
+    voted on or logged. correct() is side-effect free; check() also counts
+    valid / corrected / rejected reads for stats().
+
+    >>> v = PlateValidator(['id'])
+    >>> v.correct('AD 1O1O AA 12.28')
+    ('AD 1010 AA', 2)
+    >>> v.correct('8 1234 XY')
+    ('B 1234 XY', 1)
+    >>> v.correct('B1234XY')
+    ('B 1234 XY', 0)
+    >>> v.correct('B 12 34 XY')
+    ('B 1234 XY', 0)
+    >>> v.correct('B 12345 XY') is None
+    True
+    """
+
+    def __init__(self, formats=('id',)):
+        unknown = [name for name in formats if name not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown plate format(s): {', '.join(unknown)}; known: {', '.join(FORMATS)}")
+        self.formats = [FORMATS[name] for name in formats]
+        self.lock = threading.Lock()
+        self.counts = {"valid": 0, "corrected": 0, "rejected": 0}
+
+    def correct(self, text):
+        """(corrected text, fixes) for the best-matching format, or None when no format fits."""
+        best = None
+        for plate_format in self.formats:
+            parsed = plate_format.parse(text)
+            if parsed is not None and (best is None or parsed[1] < best[1]):
+                best = parsed
+        return best
+
+    def check(self, text):
+        parsed = self.correct(text)
+        with self.lock:
+            if parsed is None:
+                self.counts["rejected"] += 1
+            else:
+                self.counts["corrected" if parsed[1] else "valid"] += 1
+        return parsed[0] if parsed else None
+
+    def stats(self):
+        with self.lock:
+            return {"formats": [f.name for f in self.formats], **self.counts}
@@ -0,0 +1,155 @@
+"""
+Plate crop preprocessing and OCR helpers.
+
+Kept free of YOLO/torch imports so OCR worker processes can load it cheaply.
+"""
+
+import cv2
+import numpy as np
+
+
+def order_points(pts):
+    rect = np.zeros((4, 2), dtype="float32")
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)]
+    rect[2] = pts[np.argmax(s)]
+    diff = np.diff(pts, axis=1)
+    rect[1] = pts[np.argmin(diff)]
+    rect[3] = pts[np.argmax(diff)]
+    return rect
+
+
+def perspective_transform(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    edges = cv2.dilate(edges, kernel, iterations=1)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours: return image
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        peri = cv2.arcLength(contour, True)
+        approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
+        if len(approx) == 4:
+            pts = approx.reshape(4, 2).astype("float32")
+            rect = order_points(pts)
+            (tl, tr, br, bl) = rect
+            widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
+            widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
+            maxWidth = max(int(widthA), int(widthB))
+            heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
+            heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
+            maxHeight = max(int(heightA), int(heightB))
+            if maxWidth < 50 or maxHeight < 20: continue
+            aspect_ratio = maxWidth / maxHeight
+            if not (1.5 < aspect_ratio < 6.0): continue
+            dst = np.array([[0, 0], [maxWidth - 1, 0], [maxWidth - 1, maxHeight - 1], [0, maxHeight - 1]], dtype="float32")
+            M = cv2.getPerspectiveTransform(rect, dst)
+            warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
+            return warped
+    return image
+
+
+def deskew_image(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = np.column_stack(np.where(thresh > 0))
+    if len(coords) < 10: return image
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle < -45: angle = 90 + angle
+    elif angle > 45: angle = angle - 90
+    if abs(angle) < 0.5: return image
+    (h, w) = image.shape[:2]
+    center = (w // 2, h // 2)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    return rotated
+
+
+def preprocess_plate_image(plate_img):
+    if plate_img is None or plate_img.size == 0: return plate_img
+    height, width = plate_img.shape[:2]
+    if width < 200:
+        scale = 200 / width
+        plate_img = cv2.resize(plate_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    plate_img = perspective_transform(plate_img)
+    plate_img = deskew_image(plate_img)
+    denoised = cv2.bilateralFilter(plate_img, 9, 75, 75)
+    lab = cv2.cvtColor(denoised, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+    enhanced = cv2.merge([l, a, b])
+    result = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+    kernel = np.array([[-1, -1, -1], [-1,  9, -1], [-1, -1, -1]])
+    result = cv2.filter2D(result, -1, kernel)
+    return result
+
+
+def parse_ocr_result(result):
+    """Join every recognised line of a PaddleOCR result into (text, mean_conf)."""
+    if result is None: return "", 0.0
+    texts = []
+    confidences = []
+
+    # Robust result parsing matching detect_and_ocr.py
+    for item in result:
+        if hasattr(item, 'rec_texts') and hasattr(item, 'rec_scores'):
+            # PaddleOCR v3.x object format
+            for text, score in zip(item.rec_texts, item.rec_scores):
+                if text and score > 0:
+                    texts.append(text)
+                    confidences.append(float(score))
+        elif isinstance(item, dict):
+            # Dictionary format
+            if 'rec_texts' in item and 'rec_scores' in item:
+                for text, score in zip(item['rec_texts'], item['rec_scores']):
+                    if text and score > 0:
+                        texts.append(text)
+                        confidences.append(float(score))
+        elif isinstance(item, (list, tuple)):
+            # Legacy list format
+            for detection in item if item else []:
+                if detection and len(detection) >= 2:
+                    text_info = detection[1]
+                    if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
+                        texts.append(str(text_info[0]))
+                        confidences.append(float(text_info[1]))
+                    elif isinstance(text_info, str):
+                        texts.append(text_info)
+                        confidences.append(0.5)
+
+    if texts:
+        return " ".join(texts), sum(confidences)/len(confidences)
+    return "", 0.0
+
+
+def perform_ocr(ocr_model, plate_img):
+    try:
+        return parse_ocr_result(ocr_model.predict(plate_img))
+    except Exception as e:
+        print(f"[OCR ERROR] {e}")
+        return "", 0.0
+
+
+def perform_ocr_batch(ocr_model, plate_imgs):
+    """
+    OCR several crops with a single predict() call.
+    Returns one (text, conf) per crop, in input order.
+    """
+    results = [("", 0.0)] * len(plate_imgs)
+    valid = [i for i, img in enumerate(plate_imgs) if img is not None and img.size > 0]
+    if not valid:
+        return results
+    try:
+        # PaddleOCR 3.x yields one result per input image when given a list
+        batch = list(ocr_model.predict([plate_imgs[i] for i in valid]))
+        if len(batch) != len(valid):
+            raise ValueError(f"expected {len(valid)} results, got {len(batch)}")
+        for i, item in zip(valid, batch):
+            results[i] = parse_ocr_result([item])
+    except Exception as e:
+        print(f"[OCR BATCH ERROR] {e}, falling back to single-crop OCR")
+        for i in valid:
+            results[i] = perform_ocr(ocr_model, plate_imgs[i])
+    return results
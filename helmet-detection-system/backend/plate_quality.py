@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+RAW = 'raw'
+ENHANCED = 'enhanced'
+DISCARD = 'discard'
+
+
+def estimate_skew(gray):
+    """
+    Tilt in degrees of the text block: the minimum-area rectangle around the
+    minority Otsu class (the characters on either a light or a dark plate),
+    the same estimate deskew_image uses.
+    """
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(mask) > mask.size // 2:
+        mask = cv2.bitwise_not(mask)
+    ys, xs = np.nonzero(mask)
+    if len(xs) < 10:
+        return 0.0
+    (_, _), (w, h), angle = cv2.minAreaRect(np.column_stack((xs, ys)).astype(np.float32))
+    if w < h:
+        angle -= 90
+    # Fold onto (-45, 45]: a tilt of a few degrees either way
+    return float((angle + 45) % 90 - 45)
+
+
+def score_plate(plate_img, work_height=48):
+    """
+    Cheap readability measurements, taken on a copy scaled to work_height so
+    the cost is constant and blur is comparable across crop sizes.
+      blur: Laplacian variance (higher is sharper)
+      contrast: 5th-95th percentile gray spread, 0..1
+      width / height: original crop size in pixels
+      skew: estimated tilt in degrees
+    """
+    if plate_img is None or plate_img.size == 0:
+        return {"blur": 0.0, "contrast": 0.0, "width": 0, "height": 0, "skew": 0.0}
+    h, w = plate_img.shape[:2]
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    scale = work_height / h
+    small = cv2.resize(gray, (max(1, int(round(w * scale))), work_height),
+                       interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    lo, hi = np.percentile(small, (5, 95))
+    return {
+        "blur": round(float(cv2.Laplacian(small, cv2.CV_64F).var()), 1),
+        "contrast": round(float(hi - lo) / 255.0, 3),
+        "width": int(w),
+        "height": int(h),
+        "skew": round(estimate_skew(small), 1)
+    }
+
+
+class PlateQualityRouter:
+    """
+    Decides how a plate crop is OCR'd before any OCR runs:
+      discard  - too small, blurred or flat to read; never reaches OCR
+      raw      - large, sharp, contrasty and level; OCR as is
+      enhanced - everything in between; straight to preprocess_plate_image
+    so each crop gets one OCR pass instead of raw-then-retry.
+
+    With log_path set, every routed crop is appended as a JSON line with
+    its scores and, once known, the OCR outcome, for tuning the thresholds.
+    """
+
+    def __init__(self, min_width=40, min_height=12, min_blur=20.0, min_contrast=0.08,
+                 raw_width=120, raw_blur=150.0, raw_contrast=0.35, raw_max_skew=4.0, log_path=None):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_blur = min_blur
+        self.min_contrast = min_contrast
+        self.raw_width = raw_width
+        self.raw_blur = raw_blur
+        self.raw_contrast = raw_contrast
+        self.raw_max_skew = raw_max_skew
+
+        self.lock = threading.Lock()
+        self.counts = {RAW: 0, ENHANCED: 0, DISCARD: 0}
+        self.log_file = open(log_path, 'a') if log_path else None
+
+    def classify(self, scores):
+        if (scores["width"] < self.min_width or scores["height"] < self.min_height or
+                scores["blur"] < self.min_blur or scores["contrast"] < self.min_contrast):
+            return DISCARD
+        if (scores["width"] >= self.raw_width and scores["blur"] >= self.raw_blur and
+                scores["contrast"] >= self.raw_contrast and abs(scores["skew"]) <= self.raw_max_skew):
+            return RAW
+        return ENHANCED
+
+    def route(self, plate_img):
+        """Returns (route, scores) and counts the crop under its route."""
+        route, scores = self.assess(plate_img)
+        self.count(route)
+        return route, scores
+
+    def assess(self, plate_img):
+        """(route, scores) without counting; count() once the crop is actually OCR'd or discarded."""
+        scores = score_plate(plate_img)
+        return self.classify(scores), scores
+
+    def count(self, route):
+        with self.lock:
+            self.counts[route] += 1
+
+    def record(self, route, scores, text=None, conf=None, **extra):
+        if self.log_file is None:
+            return
+        entry = {"time": round(time.time(), 3), "route": route, **scores, "text": text, "conf": conf, **extra}
+        with self.lock:
+            self.log_file.write(json.dumps(entry) + '\n')
+            self.log_file.flush()
+
+    def stats(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            return {**self.counts,
+                    "discard_ratio": round(self.counts[DISCARD] / total, 3) if total else 0.0}
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
@@ -0,0 +1,191 @@
+import threading
+
+import cv2
+import numpy as np
+
+from ocr_fusion import PlateVoter
+
+
+def crop_quality(plate_img):
+    """Cheap readability score: larger and sharper crops score higher."""
+    if plate_img is None or plate_img.size == 0:
+        return 0.0
+    h, w = plate_img.shape[:2]
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(np.sqrt(w * h) * sharpness / (sharpness + 100.0))
+
+
+class PlateTrackState:
+    def __init__(self, track_id):
+        self.track_id = track_id
+        self.rider_id = None
+        self.best_crop = None
+        self.best_info = None   # caller's data for best_crop (its quality route and scores)
+        self.best_quality = 0.0
+        self.best_version = 0   # bumps whenever a better crop is seen
+        self.ocr_version = 0    # best_version that was last sent to OCR
+        self.pending = False
+        self.attempts = 0
+        self.voter = PlateVoter()
+        self.read_crop = None   # crop behind the most confident read, kept for the log
+        self.read_conf = 0.0
+        self.final_text = ""
+        self.done = False
+        self.expired = False
+        self.first_seen = None  # sightings passed to seen(), e.g. {"ts": ..., "frame": ..., "pos_ms": ...}
+        self.last_seen = None
+
+
+class PlateTrackRegistry:
+    """
+    Per-track OCR scheduling.
+
+    Each plate track keeps the best-quality crop seen so far and OCRs it first.
+    Until the fused multi-frame read is final, later sightings of comparable
+    quality are read as extra votes. At most one job per track is in flight,
+    and a track is never read again once its fused read is final.
+    """
+
+    def __init__(self, max_attempts=5, min_gain=1.2, vote_ratio=0.8):
+        self.max_attempts = max_attempts
+        self.min_gain = min_gain
+        self.vote_ratio = vote_ratio
+        self.lock = threading.Lock()
+        self.states = {}
+
+    def seen(self, track_id, rider_id, sighting):
+        """Record when / where the plate was seen with its violation, whether or not it is OCR'd."""
+        with self.lock:
+            state = self.states.get(track_id)
+            if state is None:
+                state = self.states[track_id] = PlateTrackState(track_id)
+            state.rider_id = rider_id
+            if state.first_seen is None:
+                state.first_seen = sighting
+            state.last_seen = sighting
+
+    def observe(self, track_id, rider_id, crop, quality, info=None):
+        """
+        Record a sighting. Returns (crop to OCR now, the info passed with
+        that crop) and marks the track pending, or None if nothing should be
+        scheduled. The crop can be an earlier, better sighting than this one.
+        """
+        with self.lock:
+            state = self.states.get(track_id)
+            if state is None:
+                state = self.states[track_id] = PlateTrackState(track_id)
+            state.rider_id = rider_id
+            if state.done:
+                return None
+
+            if quality > state.best_quality * self.min_gain:
+                state.best_crop = crop.copy()
+                state.best_info = info
+                state.best_quality = quality
+                state.best_version += 1
+
+            if state.pending or state.attempts >= self.max_attempts:
+                return None
+
+            if state.best_version != state.ocr_version:
+                state.pending = True
+                state.ocr_version = state.best_version
+                return state.best_crop, state.best_info
+
+            # Best crop already read: a fresh, comparable sighting is another vote
+            if quality >= state.best_quality * self.vote_ratio:
+                state.pending = True
+                return crop.copy(), info
+            return None
+
+    def on_result(self, track_id, text, conf, crop):
+        """
+        Store an OCR result. Returns the read to log if this track just
+        became final, otherwise None.
+        """
+        with self.lock:
+            state = self.states.get(track_id)
+            if state is None or state.done:
+                return None
+            state.pending = False
+            state.attempts += 1
+            if text:
+                state.voter.add(text, conf)
+                if conf > state.read_conf:
+                    state.read_conf = conf
+                    state.read_crop = crop
+
+            if state.voter.is_final() or state.attempts >= self.max_attempts:
+                read = self._finalize(state)
+                if state.expired:
+                    del self.states[track_id]
+                return read
+            return None
+
+    def cancel(self, track_id):
+        """
+        An OCR job for this track was dropped before running. Makes the best
+        crop eligible again; returns the read to log if the track had
+        meanwhile been lost.
+        """
+        with self.lock:
+            state = self.states.get(track_id)
+            if state is None or state.done:
+                return None
+            state.pending = False
+            state.ocr_version = 0
+            if state.expired:
+                read = self._finalize(state)
+                del self.states[track_id]
+                return read
+            return None
+
+    def expire(self, track_ids):
+        """Drop lost tracks, returning the best unconfident reads that were never logged."""
+        reads = []
+        with self.lock:
+            for track_id in track_ids:
+                state = self.states.get(track_id)
+                if state is None:
+                    continue
+                if state.pending:
+                    # Let the in-flight job finish; on_result finalizes it
+                    state.attempts = self.max_attempts
+                    state.expired = True
+                    continue
+                read = self._finalize(state)
+                if read:
+                    reads.append(read)
+                del self.states[track_id]
+        return reads
+
+    def expire_all(self):
+        """Expire every track, e.g. at the end of a recording."""
+        with self.lock:
+            track_ids = list(self.states)
+        return self.expire(track_ids)
+
+    def status(self, track_id):
+        """Returns (status, text) for annotation; status is done/pending/waiting."""
+        with self.lock:
+            state = self.states.get(track_id)
+            if state is None:
+                return None, ""
+            if state.done:
+                return "done", state.final_text
+            return ("pending" if state.pending else "waiting"), ""
+
+    def _finalize(self, state):
+        if state.done:
+            return None
+        state.done = True
+        state.best_crop = None
+        text, conf, agreement = state.voter.fuse()
+        state.final_text = text
+        if not text:
+            return None
+        return {"track_id": state.track_id, "rider_id": state.rider_id,
+                "text": text, "conf": conf, "crop": state.read_crop,
+                "reads": len(state.voter.reads), "agreement": agreement,
+                "first_seen": state.first_seen, "last_seen": state.last_seen}
@@ -0,0 +1,184 @@
+"""
+Headless video mode: run the detection pipeline once over a recorded clip,
+as fast as the machine allows, without the Flask server.
+
+    python process_video.py footage.mp4 --output annotated.mp4 --violations violations.jsonl
+
+Frames are decoded on a prefetch thread, detected in batches through the
+same Detector as the live stream (tracking, per-track OCR, voting), written
+to an annotated video on a writer thread, and every violation is appended
+to a JSONL file with the frame index and video position where its plate
+was first and last seen.
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from detection import Detector
+
+_END = object()
+
+
+class JsonlViolationLog:
+    """Stand-in for LogStore that appends each violation as one JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'w')
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        with self.lock:
+            for record in records:
+                self.count += 1
+                self.file.write(json.dumps(dict(record, id=self.count)) + '\n')
+            self.file.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def decode_frames(capture, frames, max_frames=None, fps=25):
+    """Prefetch thread: read every frame once, in order, as (frame, (index, position in ms))."""
+    count = 0
+    while max_frames is None or count < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        # Some backends report no position; fall back to the nominal frame rate
+        pos_ms = capture.get(cv2.CAP_PROP_POS_MSEC) or 1000.0 * count / fps
+        frames.put((frame, (count, round(pos_ms, 1))))
+        count += 1
+    frames.put(_END)
+
+
+def write_frames(writer, frames):
+    while True:
+        frame = frames.get()
+        if frame is _END:
+            break
+        writer.write(frame)
+
+
+def process_video(input_path, output_path, violations_path, detector, batch_size=8, max_frames=None,
+                  prefetch=32, report_every=100, camera_id='video'):
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video: {input_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+
+    writer = None
+    if output_path:
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+    decoded = queue.Queue(maxsize=prefetch)
+    encoded = queue.Queue(maxsize=prefetch)
+    reader_thread = threading.Thread(target=decode_frames, args=(capture, decoded, max_frames, fps), daemon=True)
+    reader_thread.start()
+    writer_thread = None
+    if writer is not None:
+        writer_thread = threading.Thread(target=write_frames, args=(writer, encoded), daemon=True)
+        writer_thread.start()
+
+    print(f"[INFO] Processing {input_path} ({size[0]}x{size[1]} @ {fps:.1f} fps, {total or '?'} frames)")
+    start = time.time()
+    processed = 0
+    finished = False
+    while not finished:
+        batch, positions = [], []
+        while len(batch) < batch_size:
+            item = decoded.get()
+            if item is _END:
+                finished = True
+                break
+            batch.append(item[0])
+            positions.append(item[1])
+        if not batch:
+            break
+
+        for annotated in detector.detect_batch(batch, [camera_id] * len(batch), positions):
+            if writer_thread is not None:
+                encoded.put(annotated)
+        processed += len(batch)
+
+        if processed // report_every != (processed - len(batch)) // report_every:
+            print(f"[PROGRESS] {processed}/{total or '?'} frames, {processed / (time.time() - start):.1f} frames/sec")
+
+    detect_time = time.time() - start
+    # OCR for the last tracks can still be queued; wait so no violation is lost
+    detector.flush()
+    if writer_thread is not None:
+        encoded.put(_END)
+        writer_thread.join()
+        writer.release()
+    capture.release()
+    elapsed = time.time() - start
+
+    report = {
+        "frames": processed,
+        "seconds": round(elapsed, 2),
+        "frames_per_sec": round(processed / elapsed, 2) if elapsed else 0.0,
+        "detect_frames_per_sec": round(processed / detect_time, 2) if detect_time else 0.0,
+        "violations": detector.log_store.count,
+        "output": output_path,
+        "violations_file": violations_path
+    }
+    print(f"[DONE] {processed} frames in {elapsed:.1f}s ({report['frames_per_sec']} frames/sec), "
+          f"{report['violations']} violations -> {violations_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a recorded video once, without the web server")
+    parser.add_argument('input')
+    parser.add_argument('--output', help="Annotated output video (.mp4); omit to skip writing video")
+    parser.add_argument('--violations', default='violations.jsonl')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--ocr-backend', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--ocr-workers', type=int, default=2)
+    parser.add_argument('--inference-backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--no-motion-gate', action='store_true', help="Run YOLO on every frame")
+    parser.add_argument('--plate-cascade', action='store_true')
+    parser.add_argument('--quality-log', help="Append per-crop quality scores and OCR outcomes (JSONL)")
+    parser.add_argument('--plate-formats', nargs='*', default=['id'],
+                        help="Plate grammars reads must match (plate_format.FORMATS); none disables the check")
+    args = parser.parse_args()
+
+    log = JsonlViolationLog(args.violations)
+    # Offline: no latency budget, every frame gets full-quality detection, and a
+    # full OCR queue makes detection wait instead of dropping crops
+    detector = Detector(ocr_backend=args.ocr_backend, ocr_workers=args.ocr_workers, log_store=log,
+                        ocr_drop_policy='block', motion_gating=not args.no_motion_gate, latency_budget_ms=None,
+                        plate_cascade=args.plate_cascade, inference_backend=args.inference_backend,
+                        ocr_queue_size=max(16, 4 * args.batch_size), plate_quality_log=args.quality_log,
+                        plate_formats=args.plate_formats)
+    try:
+        report = process_video(args.input, args.output, args.violations, detector,
+                               batch_size=args.batch_size, max_frames=args.max_frames)
+        print(json.dumps(report, indent=2))
+    finally:
+        log.close()
+        if detector.ocr_pool is not None:
+            detector.ocr_pool.close()
+
+
+if __name__ == "__main__":
+    main()
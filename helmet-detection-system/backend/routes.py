@@ -1,61 +1,151 @@
 from flask import Blueprint, Response, request, jsonify, current_app
-from camera import VideoCamera
+from cameras import CameraRegistry
 from detection import Detector
-import cv2
+from pipeline import StreamPipeline
+from clip_recorder import ClipRecorder
+from log_store import LogStore
+from events import EventBus, format_sse
+from metrics import REGISTRY
 import threading
 import time
-import json
+import hashlib
 import os
 
 api = Blueprint('api', __name__)
 
 # Global state
-camera = None
+cameras = None
 detector = None
-lock = threading.Lock()
+pipeline = None
+log_store = None
+event_bus = None
+# Re-entrant: get_event_bus / get_detector build the log store while holding it
+lock = threading.RLock()
 
-def get_camera():
-    global camera
-    if camera is None:
-        camera = VideoCamera(0) # Default to webcam
+def get_cameras():
+    """
+    Registry of monitored streams. CAMERAS="gate=rtsp://...;lobby=rtsp://..."
+    registers them at startup; without it a 'default' webcam is used.
+    """
+    global cameras
+    with lock:
+        if cameras is None:
+            cameras = CameraRegistry()
+            for entry in os.environ.get('CAMERAS', '').split(';'):
+                if '=' in entry:
+                    camera_id, source = (part.strip() for part in entry.split('=', 1))
+                    cameras.add(camera_id, int(source) if source.isdigit() else source)
+    return cameras
+
+def get_camera(camera_id='default'):
+    registry = get_cameras()
+    camera = registry.get(camera_id)
+    if camera is None and camera_id == 'default':
+        camera = registry.add('default', 0) # Default to webcam
     return camera
 
+def get_log_store():
+    global log_store
+    with lock:
+        if log_store is None:
+            logs_dir = os.path.join(current_app.root_path, 'logs')
+            log_store = LogStore(os.path.join(logs_dir, 'detections.db'),
+                                 legacy_json=os.path.join(logs_dir, 'detections.json'))
+    return log_store
+
+def get_event_bus():
+    global event_bus
+    with lock:
+        if event_bus is None:
+            # Only the latest stats matter; violations keep their own, longer history
+            event_bus = EventBus(keep={'stats': 1})
+            # Violations are pushed from the same writer that commits them to the log
+            get_log_store().add_listener(lambda record: event_bus.publish('violation', record, record['id']))
+            threading.Thread(target=publish_stats, daemon=True).start()
+    return event_bus
+
+def collect_stats():
+    det_stats = detector.get_stats() if detector else None
+    return {
+        "cameras": cameras.stats() if cameras else None,
+        "fps": det_stats["fps"] if det_stats else None,
+        "streams": det_stats["streams"] if det_stats else None,
+        "pipeline": pipeline.stats() if pipeline else None,
+        "ocr_queue": det_stats["ocr_queue"] if det_stats else None,
+        "ocr_cache": det_stats["ocr_cache"] if det_stats else None,
+        "plate_quality": det_stats["plate_quality"] if det_stats else None,
+        "plate_format": det_stats["plate_format"] if det_stats else None,
+        "adaptive": det_stats["adaptive"] if det_stats else None,
+        "cascade": det_stats["cascade"] if det_stats else None,
+        "clips": det_stats["clips"] if det_stats else None,
+        "metrics": REGISTRY.snapshot()
+    }
+
+def publish_stats(interval=2.0):
+    while True:
+        time.sleep(interval)
+        event_bus.publish('stats', collect_stats())
+
+def parse_rois(value):
+    """'x1,y1,x2,y2;...' in normalised coordinates -> list of tuples, or None."""
+    if not value:
+        return None
+    return [tuple(float(v) for v in roi.split(',')) for roi in value.split(';') if roi.strip()]
+
 def get_detector():
     global detector
-    if detector is None:
-        detector = Detector()
+    with lock:
+        if detector is None:
+            # OCR_BACKEND=process runs OCR_WORKERS PaddleOCR processes instead of a thread
+            # MOTION_GATING=0 disables the static-scene skip, MOTION_ROIS limits where motion counts,
+            # LATENCY_BUDGET_MS=0 turns off the adaptive stride / imgsz / OCR sampling controller,
+            # PLATE_CASCADE=1 re-detects missing plates on upsampled rider crops,
+            # INFERENCE_BACKEND=onnx|openvino (INT8=1 CALIB_DIR=... for openvino) swaps the YOLO runtime,
+            # OCR_CACHE_DB=path keeps OCR results across restarts,
+            # PLATE_QUALITY=0 restores raw-then-enhanced OCR, PLATE_QUALITY_LOG=path records crop scores,
+            # PLATE_FORMATS=id[,...] picks the plate grammars reads must match (empty disables the check)
+            detector = Detector(ocr_backend=os.environ.get('OCR_BACKEND', 'thread'),
+                                ocr_workers=int(os.environ.get('OCR_WORKERS', '2')),
+                                log_store=get_log_store(),
+                                motion_gating=os.environ.get('MOTION_GATING', '1') != '0',
+                                motion_rois=parse_rois(os.environ.get('MOTION_ROIS')),
+                                latency_budget_ms=float(os.environ.get('LATENCY_BUDGET_MS', '100')),
+                                plate_cascade=os.environ.get('PLATE_CASCADE', '0') == '1',
+                                inference_backend=os.environ.get('INFERENCE_BACKEND', 'torch'),
+                                int8=os.environ.get('INT8', '0') == '1',
+                                calib_dir=os.environ.get('CALIB_DIR'),
+                                ocr_cache_path=os.environ.get('OCR_CACHE_DB'),
+                                plate_quality=os.environ.get('PLATE_QUALITY', '1') != '0',
+                                plate_quality_log=os.environ.get('PLATE_QUALITY_LOG'),
+                                plate_formats=[f.strip() for f in os.environ.get('PLATE_FORMATS', 'id').split(',') if f.strip()])
     return detector
 
-def gen_frames():
-    cam = get_camera()
+def get_pipeline():
     det = get_detector()
-    
-    while True:
-        frame = cam.get_frame()
-        if frame is not None:
-            # Run detection
-            annotated_frame = det.detect(frame)
-            
-            # Encode
-            ret, buffer = cv2.imencode('.jpg', annotated_frame)
-            frame = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        else:
-            time.sleep(0.1)
+    registry = get_cameras()
+    global pipeline
+    with lock:
+        if pipeline is None:
+            # CLIP_PRE_SECONDS / CLIP_POST_SECONDS around each violation, at most
+            # CLIP_BUFFER_MB of JPEGs over all cameras and clips; CLIPS=0 disables clip recording.
+            # DETECT_WATCHED_ONLY=1 only runs detection on cameras whose feed is open
+            recorder = None
+            if os.environ.get('CLIPS', '1') != '0':
+                recorder = ClipRecorder(os.path.join(current_app.root_path, 'static', 'clips'),
+                                        pre_seconds=float(os.environ.get('CLIP_PRE_SECONDS', '5')),
+                                        post_seconds=float(os.environ.get('CLIP_POST_SECONDS', '5')),
+                                        max_bytes=int(float(os.environ.get('CLIP_BUFFER_MB', '64')) * 1024 * 1024))
+            pipeline = StreamPipeline(registry, det, recorder=recorder,
+                                      watched_only=os.environ.get('DETECT_WATCHED_ONLY', '0') == '1')
+    return pipeline
 
-@api.route('/video_feed')
-def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+def start_monitoring():
+    """Start detection for the registered cameras without waiting for a viewer (needs an app context)."""
+    if get_cameras().items():
+        get_pipeline().start()
 
-@api.route('/api/config', methods=['POST'])
-def config():
-    global camera
-    data = request.json
-    mode = data.get('mode') # 'webcam', 'file', 'rtsp'
-    value = data.get('value') # path or url
-    
+def parse_source(mode, value):
+    """Returns (source, error message)."""
     source = 0
     if mode == 'webcam':
         try:
@@ -63,33 +153,183 @@ def config():
         except:
             source = 0
     elif mode == 'file':
-        if not os.path.exists(value):
-            return jsonify({"status": "error", "message": "File not found"}), 400
+        if not value or not os.path.exists(value):
+            return None, "File not found"
         source = value
     elif mode == 'rtsp':
         source = value
-        
-    with lock:
-        if camera:
-            camera.set_source(source)
-        else:
-            camera = VideoCamera(source)
+    return source, None
+
+def set_camera_source(camera_id, source):
+    get_cameras().add(camera_id, source)
+    # Tracks from the previous source mean nothing for the new one
+    if detector is not None:
+        detector.remove_stream(camera_id)
+    start_monitoring()
+
+@api.route('/video_feed')
+@api.route('/video_feed/<camera_id>')
+def video_feed(camera_id='default'):
+    if get_camera(camera_id) is None:
+        return jsonify({"status": "error", "message": "Unknown camera"}), 404
+    return Response(get_pipeline().frames(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@api.route('/api/config', methods=['POST'])
+def config():
+    data = request.json
+    mode = data.get('mode') # 'webcam', 'file', 'rtsp'
+    value = data.get('value') # path or url
+    camera_id = data.get('camera_id') or 'default'
+
+    source, error = parse_source(mode, value)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    set_camera_source(camera_id, source)
             
-    return jsonify({"status": "ok", "mode": mode, "source": source})
+    return jsonify({"status": "ok", "mode": mode, "source": source, "camera_id": camera_id})
+
+@api.route('/api/cameras', methods=['GET'])
+def list_cameras():
+    streams = detector.get_stats()["streams"] if detector else {}
+    return jsonify([{"id": camera_id, "source": str(camera.source), **camera.get_stats(),
+                     "detector": streams.get(camera_id)}
+                    for camera_id, camera in get_cameras().items()])
+
+@api.route('/api/cameras', methods=['POST'])
+def add_camera():
+    """Body: {"id": "gate", "mode": "rtsp", "value": "rtsp://..."}; replaces the source of an existing id."""
+    data = request.json or {}
+    camera_id = data.get('id')
+    if not camera_id:
+        return jsonify({"status": "error", "message": "Missing camera id"}), 400
+    source, error = parse_source(data.get('mode'), data.get('value'))
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    set_camera_source(camera_id, source)
+    return jsonify({"status": "ok", "id": camera_id, "source": source})
+
+@api.route('/api/cameras/<camera_id>', methods=['DELETE'])
+def remove_camera(camera_id):
+    if not get_cameras().remove(camera_id):
+        return jsonify({"status": "error", "message": "Unknown camera"}), 404
+    if detector is not None:
+        detector.remove_stream(camera_id)
+    return jsonify({"status": "ok", "id": camera_id})
 
 @api.route('/api/logs', methods=['GET'])
-def get_logs():
-    log_file = os.path.join(current_app.root_path, 'logs', 'detections.json')
-    if os.path.exists(log_file):
-        with open(log_file, 'r') as f:
-            try:
-                data = json.load(f)
-                return jsonify(data)
-            except:
-                return jsonify([])
-    return jsonify([])
+@api.route('/api/cameras/<camera_id>/logs', methods=['GET'])
+def get_logs(camera_id=None):
+    """
+    Newest-first page of violations.
+    Query: since (id cursor for new entries), before (id cursor for older pages), limit,
+           start / end (ISO timestamps), plate (substring), camera (id; implied by the per-camera route)
+    """
+    store = get_log_store()
+    camera_id = camera_id or request.args.get('camera')
+    # Parsed by hand: request.args.get(type=int) silently falls back to the default
+    args = request.args
+    try:
+        since = int(args['since']) if args.get('since') else None
+        before = int(args['before']) if args.get('before') else None
+        limit = min(max(int(args['limit']) if args.get('limit') else 100, 1), 1000)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid cursor or limit"}), 400
+
+    # The log is append-only, so the newest id plus the query identifies the response
+    etag = f'"{store.last_id()}-{hashlib.md5(request.full_path.encode()).hexdigest()[:12]}"'
+    if etag.strip('"') in request.if_none_match:
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        return response
+
+    # Polling with since walks forward from the cursor so no entry is skipped
+    # when more than limit arrived; items are always returned newest first
+    items = store.query(since_id=since, before_id=before,
+                        start=request.args.get('start'), end=request.args.get('end'),
+                        plate=request.args.get('plate'), camera_id=camera_id,
+                        limit=limit + 1, newest_first=since is None)
+    has_more = len(items) > limit
+    items = items[:limit]
+    if since is not None:
+        items.reverse()
+
+    response = jsonify({
+        "items": items,
+        "latest_id": items[0]['id'] if items else since,
+        "next_before": items[-1]['id'] if has_more and since is None else None,
+        "has_more": has_more
+    })
+    response.headers['ETag'] = etag
+    return response
+
+# Violations read from the log per query when a client replays what it missed
+REPLAY_PAGE = 500
+
+@api.route('/api/events')
+def events():
+    """
+    Server-Sent Events: 'violation' events (id = log id) as they are committed,
+    plus periodic 'stats'. Reconnecting clients send Last-Event-ID (or
+    ?last_event_id=) and get every violation they missed replayed first.
+    """
+    store = get_log_store()
+    bus = get_event_bus()
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    def missed(since_id, page=REPLAY_PAGE):
+        """Every committed violation after since_id, read from the log a page at a time."""
+        while True:
+            records = store.query(since_id=since_id, limit=page)
+            yield from records
+            if len(records) < page:
+                return
+            since_id = records[-1]['id']
+
+    def stream(last_id):
+        # Take the cursors before replaying so nothing committed meanwhile is lost
+        if last_id is None:
+            last_id = store.last_id()
+        seq = bus.current_seq()
+        for record in missed(last_id):
+            last_id = record['id']
+            yield format_sse('violation', record, record['id'])
+        yield format_sse('stats', collect_stats())
+
+        while True:
+            pending, seq, gaps = bus.wait(seq)
+            if 'violation' in gaps:
+                # Fell behind the bus history: catch up from the log itself
+                for record in missed(last_id):
+                    last_id = record['id']
+                    yield format_sse('violation', record, record['id'])
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for _, event, data, event_id in pending:
+                if event == 'violation':
+                    if event_id <= last_id:
+                        continue
+                    last_id = event_id
+                yield format_sse(event, data, event_id)
+
+    return Response(stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @api.route('/api/status', methods=['GET'])
 def status():
     # Return verification that backend is running
-    return jsonify({"status": "running"})
+    return jsonify({"status": "running", **collect_stats()})
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Per-stage latency quantiles, counters and gauges in Prometheus text format;
+    ?format=json returns the same numbers as JSON (the dashboard reads these).
+    """
+    if request.args.get('format') == 'json':
+        return jsonify(REGISTRY.snapshot())
+    return Response(REGISTRY.prometheus(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,48 @@
+import time
+from detections import Detections
+from tracker import ByteTracker
+from plate_tracks import PlateTrackRegistry
+from motion import MotionGate
+
+# ultralytics' default detection confidence
+PLATE_TRACK_THRESH = 0.25
+
+
+class StreamState:
+    """
+    Everything the detector keeps per camera: FPS, rider / plate trackers,
+    per-track OCR state, the motion gate and the last detections. The YOLO
+    and OCR models themselves are shared by all streams.
+    """
+
+    def __init__(self, camera_id, names, motion_gating=True, motion_rois=None):
+        self.camera_id = camera_id
+        self.prev_time = 0
+        self.fps = 0.0
+        self.frame_count = 0
+        self.removed = False   # set by Detector.remove_stream; in-flight OCR still reports here
+        self.position = None   # (frame index, ms) of the current frame in recorded footage
+
+        self.rider_tracker = ByteTracker()
+        # Plates start tracks from YOLO's own conf (0.25): OCR only runs on tracked
+        # plates, and the small, distant ones are the ones scoring under 0.4
+        self.plate_tracker = ByteTracker(high_thresh=PLATE_TRACK_THRESH)
+        self.plate_tracks = PlateTrackRegistry()
+        self.motion_gate = MotionGate(rois=motion_rois) if motion_gating else None
+        self.last_detections = Detections(names=names)
+
+    def tick(self):
+        """Count a frame and update the FPS estimate."""
+        curr_time = time.time()
+        if curr_time > self.prev_time > 0:
+            self.fps = 1 / (curr_time - self.prev_time)
+        self.prev_time = curr_time
+        self.frame_count += 1
+        return self.fps
+
+    def stats(self):
+        return {
+            "fps": round(self.fps, 1),
+            "frames": self.frame_count,
+            "motion": self.motion_gate.stats() if self.motion_gate else None
+        }
@@ -0,0 +1,140 @@
+import numpy as np
+
+from association import iou_matrix, assign
+
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter over (cx, cy, w, h)."""
+
+    std_position = 1.0 / 20
+    std_velocity = 1.0 / 160
+
+    def __init__(self, box):
+        x1, y1, x2, y2 = box
+        w, h = max(x2 - x1, 1.0), max(y2 - y1, 1.0)
+        self.x = np.array([x1 + w / 2, y1 + h / 2, w, h, 0, 0, 0, 0], dtype=np.float64)
+
+        size = max(w, h)
+        std = [2 * self.std_position * size] * 4 + [10 * self.std_velocity * size] * 4
+        self.P = np.diag(np.square(std))
+
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+    def predict(self):
+        size = max(self.x[2], self.x[3])
+        std = [self.std_position * size] * 4 + [self.std_velocity * size] * 4
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + np.diag(np.square(std))
+
+    def update(self, box):
+        x1, y1, x2, y2 = box
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        size = max(self.x[2], self.x[3])
+        R = np.diag(np.square([self.std_position * size] * 4))
+
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+
+class Track:
+    def __init__(self, track_id, box, conf):
+        self.id = track_id
+        self.kf = KalmanBoxFilter(box)
+        self.conf = conf
+        self.hits = 1
+        self.time_since_update = 0
+
+    def predict(self):
+        self.kf.predict()
+        self.time_since_update += 1
+
+    def update(self, box, conf):
+        self.kf.update(box)
+        self.conf = conf
+        self.hits += 1
+        self.time_since_update = 0
+
+    @property
+    def box(self):
+        return self.kf.box
+
+
+class ByteTracker:
+    """
+    Lightweight ByteTrack-style tracker.
+
+    Confident detections are matched to predicted tracks first; the remaining
+    low-score detections are then used only to keep existing tracks alive,
+    which bridges short occlusions without spawning spurious IDs.
+    """
+
+    def __init__(self, high_thresh=0.4, low_thresh=0.1, match_iou=0.3, low_match_iou=0.5, max_age=30):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.max_age = max_age
+        self.tracks = []
+        self.next_id = 1
+        # IDs of tracks dropped by the latest update()
+        self.removed = []
+
+    def update(self, boxes, scores):
+        """
+        Feed one frame of detections.
+        Returns an int array of track IDs aligned with boxes (-1 = not tracked).
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        ids = np.full(len(boxes), -1, dtype=np.int64)
+
+        for track in self.tracks:
+            track.predict()
+
+        high = np.flatnonzero(scores >= self.high_thresh)
+        low = np.flatnonzero((scores >= self.low_thresh) & (scores < self.high_thresh))
+
+        # First pass: confident detections against every track
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched_high = self._match(high, boxes, scores, unmatched_tracks, self.match_iou, ids)
+
+        # Second pass: low-score detections only extend surviving tracks
+        self._match(low, boxes, scores, unmatched_tracks, self.low_match_iou, ids)
+
+        for det in unmatched_high:
+            track = Track(self.next_id, boxes[det], float(scores[det]))
+            self.next_id += 1
+            self.tracks.append(track)
+            ids[det] = track.id
+
+        self.removed = [t.id for t in self.tracks if t.time_since_update > self.max_age]
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+        return ids
+
+    def _match(self, dets, boxes, scores, unmatched_tracks, min_iou, ids):
+        """Match dets to unmatched_tracks in place; returns the detections left over."""
+        if len(dets) == 0 or not unmatched_tracks:
+            return list(dets)
+
+        track_boxes = np.stack([self.tracks[t].box for t in unmatched_tracks])
+        pairs = assign(iou_matrix(boxes[dets], track_boxes), min_score=min_iou)
+
+        matched_dets, matched_tracks = set(), set()
+        for d, t in pairs:
+            track = self.tracks[unmatched_tracks[t]]
+            track.update(boxes[dets[d]], float(scores[dets[d]]))
+            ids[dets[d]] = track.id
+            matched_dets.add(d)
+            matched_tracks.add(t)
+
+        unmatched_tracks[:] = [tr for i, tr in enumerate(unmatched_tracks) if i not in matched_tracks]
+        return [det for i, det in enumerate(dets) if i not in matched_dets]
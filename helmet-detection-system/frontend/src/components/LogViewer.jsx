@@ -1,35 +1,75 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 
+const MAX_LOGS = 200;
+
 const LogViewer = () => {
     const [logs, setLogs] = useState([]);
+    const [stats, setStats] = useState(null);
+    const latestId = useRef(null);
 
     useEffect(() => {
-        const fetchLogs = async () => {
+        let source = null;
+        let cancelled = false;
+
+        const connect = async () => {
             try {
-                const res = await axios.get('http://localhost:5000/api/logs');
-                // Newest first
-                setLogs(res.data.reverse());
+                // Initial page, newest first
+                const res = await axios.get('http://localhost:5000/api/logs', { params: { limit: 50 } });
+                if (cancelled) return;
+                setLogs(res.data.items);
+                latestId.current = res.data.latest_id;
             } catch (err) {
                 console.error("Failed to fetch logs", err);
             }
+            if (cancelled) return;
+
+            // Then follow the push channel; the browser resends Last-Event-ID on reconnect
+            const resume = latestId.current !== null ? `?last_event_id=${latestId.current}` : '';
+            source = new EventSource(`http://localhost:5000/api/events${resume}`);
+            source.addEventListener('violation', (e) => {
+                const log = JSON.parse(e.data);
+                if (latestId.current !== null && log.id <= latestId.current) return;
+                latestId.current = log.id;
+                setLogs((prev) => [log, ...prev].slice(0, MAX_LOGS));
+            });
+            source.addEventListener('stats', (e) => setStats(JSON.parse(e.data)));
         };
 
-        fetchLogs();
-        const interval = setInterval(fetchLogs, 2000);
-        return () => clearInterval(interval);
+        connect();
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+        };
     }, []);
 
     return (
         <div className="log-viewer">
             <h3>Detection Logs (No Helmet)</h3>
+            {stats && (
+                <p className="pipeline-stats">
+                    FPS: {stats.fps ?? '-'}
+                    {stats.ocr_queue && ` | OCR queue: ${stats.ocr_queue.depth}/${stats.ocr_queue.capacity}`}
+                </p>
+            )}
+            {stats && stats.metrics && Object.keys(stats.metrics.stages).length > 0 && (
+                <p className="pipeline-stats">
+                    p95 ms: {Object.entries(stats.metrics.stages)
+                        .map(([stage, s]) => `${stage} ${s.p95_ms}`)
+                        .join(' | ')}
+                </p>
+            )}
             <div className="log-list">
-                {logs.length === 0 ? <p>No violations detected yet.</p> : logs.map((log, idx) => (
-                    <div key={idx} className="log-item">
+                {logs.length === 0 ? <p>No violations detected yet.</p> : logs.map((log) => (
+                    <div key={log.id} className="log-item">
                         <div className="log-info">
                             <span className="timestamp">{new Date(log.timestamp).toLocaleTimeString()}</span>
                             <span className="plate-text">Plate: <strong>{log.plate_text}</strong></span>
                             <span className="conf">Conf: {(log.confidence * 100).toFixed(1)}%</span>
+                            {log.camera_id && <span className="camera">Cam: {log.camera_id}</span>}
+                            {log.clip_path && (
+                                <a className="clip" href={`http://localhost:5000${log.clip_path}`} target="_blank" rel="noreferrer">Clip</a>
+                            )}
                         </div>
                         {log.image_path && (
                             <div className="log-img">